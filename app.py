@@ -18,27 +18,89 @@ You should have received a copy of the GNU General Public License
 along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-from flask import Flask, request, jsonify, render_template, send_file
-from flask.json import JSONEncoder
+import gzip
+import itertools
+import time
+import zlib
+from datetime import datetime, timezone
+from functools import partial
 
+from flask import (Flask, abort, g, request, jsonify, render_template, send_file,
+                   stream_with_context)
+from markupsafe import Markup
+
+import base
+import cache
 import chemistry
+import languages
+import metrics
 import nuclides
+import snapshot
+from nuclides import pack_columns, tile_blocks, tile_zoom_levels
 
-
-class CustomJSONEncoder(JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, (chemistry.Element, chemistry.TableCell)):
-            return obj.__dict__
-        return super(CustomJSONEncoder, self).default(obj)
+try:
+    import brotli
+except ImportError:  # responses are compressed with gzip only
+    brotli = None
 
 
 app = Flask(__name__)
-app.json_encoder = CustomJSONEncoder
+
+# May be set to True to serve /metrics and Server-Timing headers, see the metrics module
+metrics.enabled = False
 
 # May be set to chemistry.ApiElementProvider (slower, but more up-to-date)
+# or to the Snapshot*Provider or Shared*Provider classes, loading a file written by
+# build_snapshot.py
 element_provider_class = chemistry.SparqlElementProvider
 nuclide_provider_class = nuclides.SparqlNuclideProvider
 
+# May be set to cache.SqliteCache(path) to share the upstream data between workers
+base.json_cache = cache.MemoryCache(maxsize=200, ttl=21600)
+
+snapshots = snapshot.SnapshotStore(max_age=21600, refresh_ahead=1800)
+# labels are the only language-dependent data, keep them for the most used languages
+label_snapshots = snapshot.SnapshotStore(max_age=21600, refresh_ahead=1800, maxsize=50)
+
+language_index = languages.LanguageIndex(
+    lambda: element_provider_class.get_available_languages())
+
+# Cache-Control header of all pages, whose data changes at most every few hours
+cache_control = 'public, max-age=3600'
+
+# the pages not built from Wikidata only change along with the templates
+static_pages = snapshot.Snapshot(None, records=(
+    app.jinja_loader.get_source(app.jinja_env, name)[0]
+    for name in app.jinja_loader.list_templates()))
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def brotli_stream(chunks):
+    compressor = brotli.Compressor()
+    for chunk in chunks:
+        yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+compressors = {'gzip': partial(gzip.compress, compresslevel=9)}
+stream_compressors = {'gzip': gzip_stream}
+if brotli:
+    compressors['br'] = brotli.compress
+    stream_compressors['br'] = brotli_stream
+
+# Fields of the elements returned by the API, and those they can be filtered by
+api_fields = chemistry.Element.props + ('classes',)
+api_filters = ('period', 'group', 'special')
+
+# Minimum size of the chunks of streamed pages, smaller ones are sent together
+stream_chunk_size = 16384
+
 fake_globals = {'isinstance': isinstance}
 for key in ('EmptyCell', 'UnknownCell', 'ElementCell', 'IndicatorCell'):
     fake_globals[key] = getattr(chemistry, key)
@@ -49,54 +111,250 @@ for key in ('NoneCell', 'NuclideCell'):
 
 @app.before_request
 def set_language():
-    app.language = request.args.get('lang')
-    if not app.language:
-        available_languages = element_provider_class.get_available_languages()
-        app.language = request.accept_languages.best_match(available_languages)
-    if not app.language:
-        app.language = 'en'
-    app.element_provider = element_provider_class(app.language)
-    app.nuclide_provider = nuclide_provider_class(app.language)
+    g.language = request.args.get('lang')
+    if not g.language:
+        # not fixed by the URL, so the response depends on the headers, see cached_response()
+        g.negotiated = True
+        if 'Accept-Language' in request.headers:
+            g.language = language_index.negotiate(request.headers['Accept-Language'])
+    if not g.language:
+        g.language = 'en'
+
+
+@app.before_request
+def start_timings():
+    if metrics.enabled:
+        g.started = time.perf_counter()
+        metrics.start_timings()
+
+
+@app.after_request
+def add_snapshot_age(response):
+    if g.get('snapshots'):
+        age = max(used.age for used in g.snapshots)
+        response.headers['X-Snapshot-Age'] = str(int(age))
+    return response
+
+
+@app.after_request
+def add_server_timing(response):
+    timings = metrics.stop_timings()
+    if 'started' in g:
+        rule = request.url_rule.rule if request.url_rule else 'unknown'
+        metrics.request_seconds.observe(time.perf_counter() - g.started, rule)
+    if timings:
+        # streamed pages are still being rendered, so their rendering is not included
+        response.headers['Server-Timing'] = metrics.server_timing(timings)
+    return response
+
+
+def build_elements():
+    provider = element_provider_class()
+    files = provider.get_file_versions()
+    # fetched first, so the time spent building the table is measured on its own
+    with metrics.timed('elements_fetch'):
+        records = list(provider)
+    with metrics.timed('elements_table'):
+        elements, table, special_series, incomplete = provider.get_table(records)
+    return snapshot.Snapshot((elements, table, special_series, incomplete),
+                             records=map(tuple, elements + incomplete), files=files)
+
+
+def build_labels(language):
+    elements, table, special_series, incomplete = latest(snapshots, build_elements).data
+    ids = [element.item_id for element in elements + incomplete]
+    provider = element_provider_class(language)
+    files = provider.get_file_versions()
+    labels = provider.get_labels(ids)
+    return snapshot.Snapshot(labels, records=sorted(labels.items()), files=files)
+
+
+def build_nuclides():
+    provider = nuclide_provider_class()
+    files = provider.get_file_versions()
+    with metrics.timed('nuclides_fetch'):
+        records = list(provider)
+    with metrics.timed('nuclides_table'):
+        nuclides, table, incomplete = provider.get_table(records)
+    with metrics.timed('decorate'):
+        classes = provider.get_classes(nuclides)
+    magic_numbers = tuple(provider.get_magic_numbers())
+    records = [tuple(nuclide) + tuple(nuclide.classes)
+               for nuclide in itertools.chain(nuclides, incomplete)]
+    return snapshot.Snapshot((nuclides, table, incomplete, magic_numbers, classes),
+                             records=records + list(magic_numbers), files=files)
+
+
+def latest(store, builder, *args):
+    """Return the latest snapshot built by builder(*args)."""
+    return store.get((builder.__name__,) + args, partial(builder, *args))
+
+
+def get_snapshot(store, builder, *args):
+    """Return the latest snapshot, and remember it for this request."""
+    used = latest(store, builder, *args)
+    if 'snapshots' not in g:
+        g.snapshots = []
+    g.snapshots.append(used)
+    return used
+
+
+def cached_response(key, render, mimetype='text/html', stream=False, language=None):
+    """
+    Return a response with the body returned by render(), cached with the snapshots in use.
+
+    The body and its compressed versions are built once per snapshot, and the response
+    is validated by a strong ETag derived from key and the version of the snapshots.
+    If stream is set, render() returns the chunks of the body, and they are sent
+    while the rest is still being rendered the first time.
+    language is the one of the body, if any, which must then be part of key.
+    """
+    used = [static_pages] + g.get('snapshots', [])
+    etag = snapshot.fingerprint([key] + [current.version for current in used])
+    owner = used[-1]
+    encoding = request.accept_encodings.best_match(list(compressors))
+
+    response = app.response_class(mimetype=mimetype)
+    response.set_etag(etag + ('-' + encoding if encoding else ''))
+    response.last_modified = datetime.fromtimestamp(max(current.created for current in used),
+                                                    timezone.utc)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    if language is not None and g.get('negotiated'):
+        response.vary.add('Accept-Language')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    if stream:
+        body = owner.memoize_stream((etag, None), lambda: (
+            chunk.encode('utf-8') for chunk in metrics.timed_chunks('render', render())),
+            b''.join)
+        if encoding:
+            body = owner.memoize_stream((etag, encoding),
+                                        partial(stream_compressors[encoding], body), b''.join)
+            response.content_encoding = encoding
+        # the length is not known until the whole body has been rendered
+        response.headers.pop('Content-Length', None)
+        response.response = stream_with_context(body)
+        return response
+
+    def plain():
+        with metrics.timed('render'):
+            body = render()
+        return body.encode('utf-8') if isinstance(body, str) else body
+
+    body = owner.memoize((etag, None), plain)
+    if encoding:
+        body = owner.memoize((etag, encoding), lambda: compressors[encoding](body))
+        response.content_encoding = encoding
+    response.set_data(body)
+    return response
+
+
+def buffered(chunks, size=None):
+    """Join the small chunks together, but send the large ones as soon as they come."""
+    size = size or stream_chunk_size
+    pending = []
+    length = 0
+    for chunk in chunks:
+        if len(chunk) >= size and pending:
+            yield ''.join(pending)
+            pending = []
+            length = 0
+        pending.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(pending)
+            pending = []
+            length = 0
+    if pending:
+        yield ''.join(pending)
+
+
+def generate_template(template_name, **context):
+    """Like render_template(), but return the rendered page in chunks as it is generated."""
+    template = app.jinja_env.get_template(template_name)
+    app.update_template_context(context)
+    return buffered(template.generate(context))
+
+
+def with_labels(elements, labels, fields=None):
+    """
+    Return the elements as dictionaries, with labels in the current language.
+
+    If fields are given, the dictionaries only include them.
+    """
+    rows = [dict(element.to_dict(), label=labels.get(element.item_id)) for element in elements]
+    if fields:
+        return [{field: row[field] for field in fields} for row in rows]
+    return rows
+
+
+def select(items, index, filters):
+    """Return the items matching all the (field, value) filters, looked up in the index."""
+    if not filters:
+        return items
+    positions = set.intersection(*(set(index[field].get(value, ())) for field, value in filters))
+    return [items[position] for position in sorted(positions)]
 
 
 @app.route('/')
 def index():
     """Render the index page."""
-    elements, table, special_series, incomplete = app.element_provider.get_table()
-    return render_template('index.html', table=table, special_series=special_series,
-                           incomplete=incomplete, **fake_globals)
+    language = g.language
+    elements, table, special_series, incomplete = get_snapshot(snapshots, build_elements).data
+    labels = get_snapshot(label_snapshots, build_labels, language).data
+    return cached_response(('index', language), partial(
+        render_template, 'index.html', table=table, special_series=special_series,
+        incomplete=incomplete, labels=labels, **fake_globals), language=language)
 
 
 @app.route('/nuclides')
 def nuclides():
     """Render the chart of the nuclides by half-life."""
-    nuclides, table, incomplete = app.nuclide_provider.get_table()
-    app.nuclide_provider.decorate_by_halflife(nuclides)
-    return render_nuclides(nuclides, 'nuclides.html', incomplete)
+    return render_nuclides('nuclides', 'nuclides.html')
 
 
 @app.route('/nuclide_decays')
 def nuclide_decays():
     """Render the chart of the nuclides by decay mode."""
-    nuclides, table, incomplete = app.nuclide_provider.get_table()
-    app.nuclide_provider.decorate_by_decay_mode(nuclides)
-    return render_nuclides(nuclides, 'nuclide_decays.html', incomplete)
+    return render_nuclides('nuclide_decays', 'nuclide_decays.html')
+
 
+def render_nuclides(view, template_file):
+    if request.args.get('render') == 'client':
+        # the chart is drawn by the browser from /api/nuclides, so only the templates matter
+        return cached_response((view, 'client'),
+                               partial(render_template, template_file, view=view))
+    current = get_snapshot(snapshots, build_nuclides)
+    nuclides, table, incomplete, magic_numbers, classes = current.data
+    if request.args.get('render') == 'tiles':
+        # the chart is drawn by the browser from the tiles in view, see nuclide_tile()
+        return cached_response((view, 'tiles'), partial(
+            render_template, template_file, view=view, incomplete=incomplete, tiles=True))
+    chart = partial(current.memoize_stream, ('chart', view),
+                    partial(render_chart, nuclides, table, magic_numbers, classes[view]),
+                    Markup().join)
+    # the head and the incomplete nuclides are sent ahead of the chart
+    return cached_response(view, lambda: generate_template(template_file, chart=chart(),
+                                                           incomplete=incomplete), stream=True)
 
-def render_nuclides(nuclides, template_file, incomplete):
-    magic_numbers = app.nuclide_provider.get_magic_numbers()
-    max_neutrons = max(map(lambda nuclide: nuclide.neutron_number, nuclides))
-    max_protons = max(map(lambda nuclide: nuclide.atomic_number, nuclides))
-    return render_template(template_file, nuclide_list=nuclides,
-                           magic_numbers=magic_numbers, max_neutrons=max_neutrons,
-                           max_protons=max_protons, incomplete=incomplete,
-                           **fake_globals)
+
+def render_chart(nuclides, table, magic_numbers, classes):
+    """Render the SVG chart of the nuclides, which is the bulk of the nuclide pages, in chunks."""
+    max_neutrons = table.max_neutron_number
+    max_protons = table.max_atomic_number
+    return map(Markup, generate_template('nuclide_chart.html', nuclide_list=nuclides,
+                                         nuclide_classes=classes, magic_numbers=magic_numbers,
+                                         max_neutrons=max_neutrons, max_protons=max_protons,
+                                         **fake_globals))
 
 
 @app.route('/license')
 def license():
     """Render the license page."""
-    return render_template('license.html')
+    return cached_response('license', partial(render_template, 'license.html'))
 
 
 @app.route('/license/full')
@@ -110,12 +368,90 @@ def api():
     """Render the API result if appropriate, otherwise render the API documentation page."""
     props = request.args.getlist('props')
     if props:
-        elements, table, special_series, incomplete = app.element_provider.get_table()
-        result = {'elements': elements, 'incomplete': incomplete}
-        available_props = set(props).intersection(set(result.keys()))
-        result = {prop: result[prop] for prop in available_props}
-        return jsonify(result)
-    return render_template('api.html')
+        language = g.language
+        current = get_snapshot(snapshots, build_elements)
+        elements, table, special_series, incomplete = current.data
+        labels = get_snapshot(label_snapshots, build_labels, language).data
+        lists = {'elements': elements, 'incomplete': incomplete}
+        available_props = sorted(set(props).intersection(lists))
+        fields = ','.join(request.args.getlist('fields')).split(',')
+        fields = sorted(set(fields).intersection(api_fields))
+        filters = []
+        for field in api_filters:
+            if field in request.args:
+                value = request.args.get(field, type=int)
+                if value is None:
+                    abort(400, '{0} must be an integer'.format(field))
+                filters.append((field, value))
+
+        def render():
+            index = current.memoize('api_index', lambda: {
+                prop: element_provider_class.get_index(items, api_filters)
+                for prop, items in lists.items()})
+            return jsonify({prop: with_labels(select(lists[prop], index[prop], filters),
+                                              labels, fields)
+                            for prop in available_props}).get_data()
+
+        # the encoded result is kept for each combination until the snapshots change
+        return cached_response(('api', language, available_props, fields, filters),
+                               render, 'application/json', language=language)
+    return cached_response('api', partial(render_template, 'api.html'))
+
+
+@app.route('/api/nuclides')
+def api_nuclides():
+    """Return the data of the chart of the nuclides as columns, in JSON or packed binary."""
+    packed = request.args.get('format') == 'binary'
+    current = get_snapshot(snapshots, build_nuclides)
+    nuclides, table, incomplete, magic_numbers, classes = current.data
+    columns = current.memoize('columns', partial(nuclide_provider_class.get_columns, nuclides))
+    header = dict(nuclide_provider_class.get_column_classes(),
+                  max_atomic_number=table.max_atomic_number,
+                  max_neutron_number=table.max_neutron_number,
+                  magic_numbers=magic_numbers,
+                  incomplete=[{key: getattr(nuclide, key) for key in
+                               ('item_id', 'label', 'atomic_number', 'neutron_number')}
+                              for nuclide in incomplete])
+    if packed:
+        return cached_response(('api_nuclides', 'binary'),
+                               partial(pack_columns, header, columns),
+                               'application/octet-stream')
+    return cached_response(('api_nuclides', 'json'), lambda: jsonify(dict(
+        header, count=len(nuclides),
+        columns={name: column.tolist() for name, column in columns.items()})).get_data(),
+        'application/json')
+
+
+@app.route('/nuclides/tiles/<int:zoom>/<int:x>/<int:y>')
+def nuclide_tile(zoom, x, y):
+    """Return a tile of the chart of the nuclides, packed like /api/nuclides?format=binary."""
+    current = get_snapshot(snapshots, build_nuclides)
+    nuclides, table, incomplete, magic_numbers, classes = current.data
+    span = tile_blocks * 2 ** (tile_zoom_levels - 1 - zoom)
+    if zoom >= tile_zoom_levels or x * span > table.max_neutron_number or (
+            y * span > table.max_atomic_number):
+        abort(404)
+
+    def render():
+        block, columns = nuclide_provider_class.get_tile(table, zoom, x, y)
+        header = dict(nuclide_provider_class.get_column_classes(),
+                      zoom=zoom, x=x, y=y, block=block, span=span,
+                      zoom_levels=tile_zoom_levels, tile_blocks=tile_blocks,
+                      max_atomic_number=table.max_atomic_number,
+                      max_neutron_number=table.max_neutron_number,
+                      magic_numbers=magic_numbers)
+        return pack_columns(header, columns)
+
+    # both views are drawn from the same tiles, which are built once per snapshot
+    return cached_response(('nuclide_tile', zoom, x, y), render, 'application/octet-stream')
+
+
+@app.route('/metrics')
+def metrics_page():
+    """Return the metrics in the Prometheus text format, if enabled."""
+    if not metrics.enabled:
+        abort(404)
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
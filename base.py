@@ -18,23 +18,316 @@ You should have received a copy of the GNU General Public License
 along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import csv
+import http.client
 import json
-from urllib.parse import urlencode
-from urllib.request import urlopen
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urlsplit
 
-from cachetools.func import ttl_cache
+import metrics
+from cache import MemoryCache
+
+USER_AGENT = 'Wikidata periodic table (https://tools.wmflabs.org/ptable/)'
+
+logger = logging.getLogger(__name__)
+
+# Cache backend used by get_json_cached(), see the cache module
+json_cache = MemoryCache(maxsize=200, ttl=21600)
+
+_state = threading.local()
+
+
+@contextmanager
+def refreshing(since=None):
+    """
+    Bypass cached information within this block, storing the fresh one instead.
+
+    The information cached after since (a timestamp, by default the start of the block)
+    is fresh enough, and is used anyway, as another process sharing the cache may have
+    fetched it meanwhile for the same refresh.
+    """
+    _state.refreshing = time.time() if since is None else since
+    try:
+        yield
+    finally:
+        _state.refreshing = None
+
+
+def refreshing_since():
+    """Return the since of the refresh of the current thread, or None, see refreshing()."""
+    return getattr(_state, 'refreshing', None)
+
+
+def is_refreshing():
+    """Whether the current thread is refreshing cached information, see refreshing()."""
+    return refreshing_since() is not None
+
+
+class SingleFlight:
+    """Run one call at a time for each key, sharing its outcome with the concurrent callers."""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, func):
+        """Return func(), or the result of the call already running for key."""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            # the error is only shared with the current callers, the next ones try again
+            self.forget(key)
+            future.set_exception(e)
+            raise
+        self.forget(key)
+        future.set_result(result)
+        return result
+
+    def forget(self, key):
+        with self.lock:
+            del self.calls[key]
+
+
+flights = SingleFlight()
 
 
-@ttl_cache(maxsize=200, ttl=21600)
 def get_json_cached(url, data, get):
     """The information is cached for 6 hours."""
+    key = json_cache.make_key(url, data, get)
+    # refreshes only use what was cached since the data they replace was built
+    since = refreshing_since()
+    result = json_cache.get(key, newer_than=since)
+    if result is not None:
+        metrics.count(metrics.upstream_cache, 'hit')
+        return result
+    # concurrent misses of the same key only fetch it once
+    return flights.do(key, partial(fetch_json_cached, key, url, data, get, since))
+
+
+def fetch_json_cached(key, url, data, get, since):
+    """Fetch and cache the JSON, unless another process cached it meanwhile."""
+    refresh = since is not None
+    # held until the fetch gives up at the latest, so the waiters do not fetch it too
+    with json_cache.locked(key, timeout=get_endpoint(url).budget):
+        result = json_cache.get(key, newer_than=since)
+        if result is None:
+            metrics.count(metrics.upstream_cache, 'miss')
+            try:
+                result = fetch_json(url, data, get)
+            except Exception:
+                # refreshes keep their previous snapshot instead, and try again sooner
+                result = None if refresh else json_cache.get(key, allow_stale=True)
+                if result is None:
+                    raise
+                metrics.count(metrics.upstream_cache, 'stale')
+                logger.warning('Serving the expired response of %s', url, exc_info=True)
+                return result
+            json_cache.set(key, result)
+    return result
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections, reused by all requests to the same host."""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.idle = defaultdict(list)
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    @staticmethod
+    def connect(scheme, netloc, timeout=None):
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=timeout)
+        return http.client.HTTPConnection(netloc, timeout=timeout)
+
+    def acquire(self, scheme, netloc, timeout=None):
+        """Return an idle connection to the host and whether it was used before."""
+        with self.lock:
+            if self.pid != os.getpid():
+                # the connections opened before fork() are shared with the parent process
+                self.idle.clear()
+                self.pid = os.getpid()
+            if self.idle[scheme, netloc]:
+                return self.idle[scheme, netloc].pop(), True
+        return self.connect(scheme, netloc, timeout), False
+
+    def release(self, scheme, netloc, conn):
+        with self.lock:
+            if len(self.idle[scheme, netloc]) < self.maxsize:
+                self.idle[scheme, netloc].append(conn)
+                return
+        conn.close()
+
+    @staticmethod
+    def send(conn, method, path, body, headers, read_timeout):
+        if conn.sock is None:
+            conn.connect()
+        conn.sock.settimeout(read_timeout)
+        conn.request(method, path, body, headers)
+        return conn.getresponse()
+
+    def open(self, method, url, body=None, headers=None, timeouts=(None, None)):
+        """
+        Perform an HTTP request and return the connection and the response, still unread.
+
+        timeouts are the connect and read timeouts in seconds, None to wait forever.
+        The connection must be passed to finish() once the response has been read.
+        """
+        connect_timeout, read_timeout = timeouts
+        parts = urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        headers = dict(headers or {}, **{'User-Agent': USER_AGENT})
+        conn, reused = self.acquire(parts.scheme, parts.netloc, connect_timeout)
+        try:
+            response = self.send(conn, method, path, body, headers, read_timeout)
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            if not reused or isinstance(e, TimeoutError):
+                raise
+            # the server may have closed the idle connection meanwhile
+            conn = self.connect(parts.scheme, parts.netloc, connect_timeout)
+            response = self.send(conn, method, path, body, headers, read_timeout)
+        if response.status >= 400:
+            self.read(url, conn, response)
+            raise HTTPError(url, response.status, response.reason, response.headers, None)
+        return conn, response
+
+    def finish(self, url, conn, response):
+        """Release the connection, whose response has been read completely."""
+        if response.will_close:
+            conn.close()
+        else:
+            parts = urlsplit(url)
+            self.release(parts.scheme, parts.netloc, conn)
+
+    def read(self, url, conn, response):
+        try:
+            raw = response.read()
+        except Exception:
+            conn.close()
+            raise
+        self.finish(url, conn, response)
+        return raw
+
+    def request(self, method, url, body=None, headers=None, timeouts=(None, None)):
+        """Perform an HTTP request and return the response body, see open()."""
+        conn, response = self.open(method, url, body, headers, timeouts)
+        return self.read(url, conn, response)
+
+
+pool = ConnectionPool()
+
+
+class UpstreamUnavailableException(Exception):
+    """The endpoint failed too many times lately, it is not called for a while."""
+
+
+class Endpoint:
+    """
+    Timeouts, retries and health of an upstream endpoint.
+
+    Failed calls are retried with a jittered exponential backoff. After failure_threshold
+    failed calls in a row, the circuit opens: calls fail immediately for reset_timeout
+    seconds, then a single call is let through to check whether the endpoint recovered.
+    """
+
+    def __init__(self, connect_timeout=5, read_timeout=30, retries=2, backoff=0.5,
+                 failure_threshold=5, reset_timeout=60):
+        self.timeouts = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    @property
+    def budget(self):
+        """Return the longest a call may take in seconds, with all its retries."""
+        connect_timeout, read_timeout = self.timeouts
+        return ((self.retries + 1) * (connect_timeout + read_timeout) +
+                sum(self.backoff * 2 ** attempt * 1.5 for attempt in range(self.retries)))
+
+    @staticmethod
+    def is_retryable(error):
+        """Whether the error may go away by itself, unlike a bad request."""
+        if isinstance(error, HTTPError):
+            return error.code >= 500 or error.code == 429
+        return isinstance(error, (http.client.HTTPException, OSError, ValueError))
+
+    def call(self, func):
+        """Return func(timeouts), retrying it on temporary errors."""
+        with self.lock:
+            if self.open_until > time.time():
+                raise UpstreamUnavailableException()
+            if self.failures >= self.failure_threshold:
+                # half-open: let this call through, the other ones still fail meanwhile
+                self.open_until = time.time() + self.reset_timeout
+        for attempt in range(self.retries + 1):
+            try:
+                result = func(self.timeouts)
+            except Exception as e:
+                if not self.is_retryable(e):
+                    raise
+                if attempt == self.retries or self.open_until > time.time() + self.backoff:
+                    self.failed()
+                    raise
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+            else:
+                with self.lock:
+                    self.failures = 0
+                    self.open_until = 0
+                return result
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.time() + self.reset_timeout
+                logger.warning('Too many failures, not calling the endpoint for %d seconds',
+                               self.reset_timeout)
+
+
+def get_endpoint(url):
+    return endpoints.get(url) or default_endpoint
+
+
+def fetch_json(url, data, get):
+    """Fetch JSON from the network."""
+    endpoint = get_endpoint(url)
     if get:
-        params = ['{0}?{1}'.format(url, data)]
+        request = partial(pool.request, 'GET', '{0}?{1}'.format(url, data))
     else:
-        params = [url, data.encode('utf-8')]
-    with urlopen(*params) as response:
-        raw = response.read()
-    return json.loads(raw.decode('utf-8'))
+        request = partial(pool.request, 'POST', url, data.encode('utf-8'),
+                          {'Content-Type': 'application/x-www-form-urlencoded'})
+    host = urlsplit(url).netloc
+
+    def call(timeouts):
+        with metrics.timed('upstream', host, histogram=metrics.upstream_seconds):
+            raw = request(timeouts=timeouts)
+        metrics.count(metrics.upstream_bytes, host, amount=len(raw))
+        with metrics.timed('parse'):
+            return json.loads(raw)
+
+    return endpoint.call(call)
 
 
 def get_json(url, data, get=False):
@@ -42,12 +335,50 @@ def get_json(url, data, get=False):
     return get_json_cached(url, urlencode(data), get)
 
 
+def map_concurrently(func, args, max_workers):
+    """Return [func(arg) for arg in args], running up to max_workers calls at once."""
+    args = list(args)
+    if max_workers <= 1 or len(args) <= 1:
+        return [func(arg) for arg in args]
+    since = refreshing_since()
+    timings = metrics.get_timings()
+
+    def call(arg):
+        _state.refreshing = since
+        metrics.use_timings(timings)
+        return func(arg)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(args))) as executor:
+        return list(executor.map(call, args))
+
+
 class PropertyAlreadySetException(Exception):
     """Property already set."""
 
 
 class TableCell:
-    """A table cell."""
+    """A table cell, which cannot be changed once built so tables can be shared."""
+    __slots__ = ()
+
+    def __setattr__(self, key, value):
+        raise AttributeError('{0} is immutable'.format(type(self).__name__))
+
+    def __delattr__(self, key):
+        raise AttributeError('{0} is immutable'.format(type(self).__name__))
+
+    @classmethod
+    def freeze(cls, record):
+        """Return a cell with the values of record, with tuples instead of lists."""
+        if isinstance(record, cls):
+            return record
+        cell = object.__new__(cls)
+        for key in type(record).props + ('classes',):
+            value = getattr(record, key)
+            object.__setattr__(cell, key, tuple(value) if isinstance(value, list) else value)
+        return cell
+
+    def to_dict(self):
+        return {}
 
 
 class BaseProvider:
@@ -55,10 +386,16 @@ class BaseProvider:
 
     WD_API = 'https://www.wikidata.org/w/api.php'
     API_LIMIT = 50
+    API_CONCURRENCY = 4  # maximum number of parallel API requests
 
-    def __init__(self, language):
+    def __init__(self, language=None):
         self.language = language
 
+    @classmethod
+    def get_file_versions(cls):
+        """Return the versions of the files the items are loaded from, by path."""
+        return {}
+
     @classmethod
     def get_available_languages(cls):
         query = dict(action='query', format='json', meta='siteinfo', siprop='languages')
@@ -67,24 +404,124 @@ class BaseProvider:
 
     @classmethod
     def get_entities(cls, ids, **kwargs):
+        queries = [dict(action='wbgetentities', format='json',
+                        ids='|'.join(ids[index:index + cls.API_LIMIT]), **kwargs)
+                   for index in range(0, len(ids), cls.API_LIMIT)]
         entities = {}
-        query = dict(action='wbgetentities', format='json', **kwargs)
-        for index in range(0, len(ids), cls.API_LIMIT):
-            query['ids'] = '|'.join(ids[index:index + cls.API_LIMIT])
-            new_entities = get_json(cls.WD_API, query).get('entities', {})
-            entities.update(new_entities)
+        # results are merged in the order of the ids regardless of completion order
+        for result in map_concurrently(partial(get_json, cls.WD_API), queries,
+                                       cls.API_CONCURRENCY):
+            entities.update(result.get('entities', {}))
         return entities
 
+    def get_labels(self, ids):
+        """Return the labels of the items in the provider language, by item id."""
+        entities = self.get_entities(ids, props='labels',
+                                     languages=self.language, languagefallback=1)
+        labels = {}
+        for item_id in ids:
+            entity = entities.get(item_id)
+            if entity and 'labels' in entity and len(entity['labels']) == 1:
+                labels[item_id] = list(entity['labels'].values())[0]['value']
+        return labels
+
     def get_table(self):
+        """Return the table, which does not depend on the provider language."""
         raise NotImplementedError()
 
 
+class StreamedResult:
+    """
+    Result bindings of a streamed query, parsed from its CSV response as they arrive.
+
+    The connection goes back to the pool once the response is read to the end. It is
+    closed if reading fails, or by close(), which must be called if the result is not read.
+    """
+
+    def __init__(self, url, conn, response):
+        self.url = url
+        self.conn = conn
+        self.response = response
+
+    def __iter__(self):
+        """Yield the rows of the response like the bindings of a JSON one."""
+        try:
+            rows = csv.reader(line.decode('utf-8') for line in self.response)
+            names = next(rows, [])
+            for row in rows:
+                # unbound variables are empty, and missing from the JSON bindings
+                yield {name: {'value': value} for name, value in zip(names, row) if value}
+            # reading the lines does not mark the response as complete, unlike read()
+            self.response.read()
+        except BaseException:
+            self.close()
+            raise
+        if self.conn is not None:
+            pool.finish(self.url, self.conn, self.response)
+            self.conn = None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
 class SparqlBase:
     """Load items from Wikidata SPARQL query service."""
 
     SPARQL_API = 'https://query.wikidata.org/sparql'
 
+    # if set, the queries only load these items, see get_values_clause()
+    item_ids = None
+    # if set, the large results are streamed instead of cached, see open_sparql()
+    STREAM_RESULTS = False
+
     @classmethod
     def get_sparql(cls, query):
         response = get_json(cls.SPARQL_API, {'query': query, 'format': 'json'}, get=True)
         return response['results']['bindings']
+
+    @classmethod
+    def open_sparql(cls, query):
+        """
+        Send the query, and return its result bindings as a StreamedResult.
+
+        The result is requested as CSV, which is more compact than JSON, and only one row
+        is kept in memory at a time. Unlike get_sparql(), the result is not cached.
+        """
+        url = '{0}?{1}'.format(cls.SPARQL_API, urlencode({'query': query}))
+        endpoint = get_endpoint(cls.SPARQL_API)
+        # only the wait for the response to start is timed, the rest is read with parsing
+        with metrics.timed('upstream', urlsplit(url).netloc, histogram=metrics.upstream_seconds):
+            conn, response = endpoint.call(lambda timeouts: pool.open(
+                'GET', url, headers={'Accept': 'text/csv'}, timeouts=timeouts))
+        return StreamedResult(url, conn, response)
+
+    def get_values_clause(self, variable):
+        """Return a clause binding the variable to item_ids, or nothing if not set."""
+        if self.item_ids is None:
+            return ''
+        return 'VALUES ?{0} {{ {1} }} '.format(
+            variable, ' '.join('wd:' + item_id for item_id in self.item_ids))
+
+    @classmethod
+    def get_items(cls, pattern):
+        """Return the ids of all the items matched by ?item in pattern."""
+        query = 'SELECT ?item WHERE {{ {0} }}'.format(pattern)
+        return [item['item']['value'].split('/')[-1] for item in cls.get_sparql(query)]
+
+    @classmethod
+    def get_modified_items(cls, pattern, since):
+        """Return the ids of the items matched by ?item in pattern and modified after since."""
+        query = 'SELECT ?item WHERE {{ {0} ?item schema:dateModified ?modified . \
+    FILTER(?modified > "{1}"^^xsd:dateTime) }}'.format(
+            pattern, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(since)))
+        return [item['item']['value'].split('/')[-1] for item in cls.get_sparql(query)]
+
+
+# May be changed to tune the timeouts and retries of each endpoint, see Endpoint
+default_endpoint = Endpoint()
+endpoints = {
+    BaseProvider.WD_API: Endpoint(read_timeout=30),
+    SparqlBase.SPARQL_API: Endpoint(read_timeout=60),
+}
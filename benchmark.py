@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import copy
+import fnmatch
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from functools import partial
+from urllib.parse import urlsplit
+
+import app as ptable
+import base
+import build_snapshot
+import chemistry
+import nuclides
+import standin
+
+logger = logging.getLogger(__name__)
+
+
+class PreloadedElementProvider(chemistry.ElementProvider):
+    """Elements already loaded, so building the table can be timed on its own."""
+
+    elements = []
+
+    def __iter__(self):
+        return iter(self.elements)
+
+
+class PreloadedNuclideProvider(nuclides.NuclideProvider):
+    """Nuclides already loaded, so building the chart can be timed on its own."""
+
+    nuclides = []
+
+    def __iter__(self):
+        return iter(self.nuclides)
+
+
+class StreamingNuclideProvider(nuclides.SparqlNuclideProvider):
+    STREAM_RESULTS = True
+
+
+def measure(func, reset=None, repeat=5, warmup=1):
+    """
+    Return the timings of func() and the memory it allocates.
+
+    reset() is called before each call, outside of the measures. The memory is measured
+    by tracing an additional call, as tracing slows down the timed ones.
+    """
+    def run():
+        if reset is not None:
+            reset()
+        gc.collect()
+
+    for _ in range(warmup):
+        run()
+        func()
+    timings = []
+    for _ in range(repeat):
+        run()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    run()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    start_size = tracemalloc.get_traced_memory()[0]
+    result = func()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {'repeat': repeat,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'peak_bytes': peak - start_size,
+            'allocated_bytes': size - start_size,
+            'allocated_blocks': sys.getallocatedblocks() - blocks}
+
+
+def get_stages(client, synthetic=None):
+    """
+    Return the stages to measure, as (name, func, reset) tuples, in order.
+
+    The stages updating a snapshot and loading incomplete data are only included with
+    synthetic (a SyntheticWikidata), which can report modified items and fail queries.
+    """
+    stores = [ptable.snapshots, ptable.label_snapshots]
+
+    def clear_upstream():
+        base.json_cache.clear()
+
+    def clear_memos():
+        for store in stores:
+            for current in store.snapshots.values():
+                current.memo.clear()
+        ptable.static_pages.memo.clear()
+
+    def clear_all():
+        clear_upstream()
+        for store in stores:
+            store.snapshots.clear()
+        ptable.static_pages.memo.clear()
+
+    # the data shared by the later stages, loaded once from the stand-in
+    elements = list(chemistry.SparqlElementProvider())
+    ids = [element.item_id for element in elements]
+    nuclide_provider = nuclides.SparqlNuclideProvider()
+    nuclide_list = list(nuclide_provider)
+    PreloadedElementProvider.elements = elements
+    PreloadedNuclideProvider.nuclides = nuclide_list
+    element_table = PreloadedElementProvider().get_table()
+    labels = chemistry.SparqlElementProvider('en').get_labels(ids)
+    chart_nuclides, chart_table, incomplete = PreloadedNuclideProvider().get_table()
+    classes = PreloadedNuclideProvider().get_classes(chart_nuclides)
+    magic_numbers = nuclide_provider.get_magic_numbers()
+
+    def fetch_nuclides(provider_class):
+        provider = provider_class()
+        return list(provider), provider.get_magic_numbers()
+
+    def render_index():
+        table, special_series, element_incomplete = element_table[1:]
+        with ptable.app.test_request_context('/'):
+            return ptable.render_template(
+                'index.html', table=table, special_series=special_series,
+                incomplete=element_incomplete, labels=labels, **ptable.fake_globals)
+
+    def render_nuclides(view, template_file):
+        with ptable.app.test_request_context('/' + view):
+            chart = ptable.render_chart(chart_nuclides, chart_table, magic_numbers,
+                                        classes[view])
+            return ''.join(ptable.generate_template(template_file, chart=chart,
+                                                    incomplete=incomplete))
+
+    def serialize_api():
+        with ptable.app.test_request_context('/api'):
+            return ptable.jsonify({'elements': ptable.with_labels(element_table[0], labels),
+                                   'incomplete': ptable.with_labels(element_table[3], labels)}
+                                  ).get_data()
+
+    def serialize_api_nuclides():
+        columns = nuclides.NuclideProvider.get_columns(chart_nuclides)
+        return nuclides.pack_columns(dict(nuclides.NuclideProvider.get_column_classes(),
+                                          magic_numbers=magic_numbers), columns)
+
+    def get(path, encoding='gzip'):
+        response = client.get(path, headers={'Accept-Encoding': encoding})
+        if response.status_code != 200:
+            raise RuntimeError('{0} returned {1}'.format(path, response.status_code))
+        return response.get_data()
+
+    stages = [
+        ('fetch.elements', lambda: list(chemistry.SparqlElementProvider()), clear_upstream),
+        ('fetch.labels', partial(chemistry.SparqlElementProvider('en').get_labels, ids),
+         clear_upstream),
+        ('fetch.nuclides', partial(fetch_nuclides, nuclides.SparqlNuclideProvider),
+         clear_upstream),
+        ('fetch.nuclides.stream', partial(fetch_nuclides, StreamingNuclideProvider),
+         clear_upstream),
+        ('table.elements', lambda: PreloadedElementProvider().get_table(), None),
+        ('table.nuclides', lambda: PreloadedNuclideProvider().get_table(), None),
+        ('decorate.halflife', partial(nuclides.NuclideProvider.decorate_by_halflife,
+                                      chart_nuclides), None),
+        ('decorate.decay_mode', partial(nuclides.NuclideProvider.decorate_by_decay_mode,
+                                        chart_nuclides), None),
+        ('decorate.classes', partial(PreloadedNuclideProvider().get_classes, chart_nuclides),
+         None),
+        ('render.index', render_index, None),
+        ('render.nuclides', partial(render_nuclides, 'nuclides', 'nuclides.html'), None),
+        ('render.nuclide_decays', partial(render_nuclides, 'nuclide_decays',
+                                          'nuclide_decays.html'), None),
+        ('serialize.api', serialize_api, None),
+        ('serialize.api_nuclides', serialize_api_nuclides, None),
+    ]
+    # the routes, cold (rendered again from the snapshots) and then warm (cached response)
+    routes = ['/', '/nuclides', '/nuclide_decays', '/api?props=elements&props=incomplete',
+              '/api/nuclides?format=binary', '/nuclides/tiles/0/0/0', '/nuclides/tiles/3/1/1']
+    for path in routes:
+        stages.append(('route.cold ' + path, partial(get, path), clear_memos))
+    for path in routes:
+        stages.append(('route.warm ' + path, partial(get, path), None))
+    stages.append(('route.start /', partial(get, '/'), clear_all))
+    if synthetic is not None:
+        stages.extend(get_synthetic_stages(synthetic, clear_upstream))
+    return stages
+
+
+def get_synthetic_stages(synthetic, clear_upstream):
+    """Return the stages of the incremental updates and of the optional queries failing."""
+    data = build_snapshot.build(['en'])
+    since = time.time()
+    # about one item in a hundred was edited since the snapshot was built
+    synthetic.touch([element['item_id'] for element in data['elements'][::100]] +
+                    [nuclide['item_id'] for nuclide in data['nuclides'][::100]], since + 1)
+    state = {}
+
+    def reset_update():
+        clear_upstream()
+        state['data'] = copy.deepcopy(data)
+
+    def update():
+        return build_snapshot.update(state['data'], since)
+
+    def fetch_degraded():
+        synthetic.failing = {'?half_life', '?decay_mode'}
+        try:
+            provider = nuclides.SparqlNuclideProvider()
+            return list(provider), provider.get_magic_numbers()
+        finally:
+            synthetic.failing = set()
+
+    return [('snapshot.update', update, reset_update),
+            ('fetch.nuclides.degraded', fetch_degraded, clear_upstream)]
+
+
+def compare(results, baseline, threshold):
+    """Return the stages slower than in the baseline by more than threshold (a ratio)."""
+    slower = []
+    for name, result in results['stages'].items():
+        previous = baseline['stages'].get(name)
+        if not previous or 'median' not in previous or 'median' not in result:
+            continue
+        ratio = result['median'] / previous['median']
+        if ratio > 1 + threshold:
+            slower.append((name, previous['median'], result['median'], ratio))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time each stage of building and serving the pages, with a local '
+                    'stand-in for Wikidata instead of the network, and print the results '
+                    'as JSON.')
+    parser.add_argument('-f', '--fixtures', metavar='PATH',
+                        help='replay the responses recorded in this file, instead of '
+                             'generated ones')
+    parser.add_argument('--record', metavar='PATH',
+                        help='fetch the responses from Wikidata once, and record them '
+                             'to this file for --fixtures')
+    parser.add_argument('-n', '--repeat', type=int, default=5,
+                        help='timed runs of each stage (default: %(default)s)')
+    parser.add_argument('-s', '--stage', action='append', dest='stages', metavar='PATTERN',
+                        help='only run the stages matching this pattern, can be repeated')
+    parser.add_argument('-o', '--output', metavar='PATH',
+                        help='file to write the results to (default: standard output)')
+    parser.add_argument('-c', '--compare', metavar='PATH',
+                        help='results of a previous run, to fail if any stage is slower')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown ratio tolerated by --compare (default: %(default)s)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+
+    synthetic = None
+    if args.fixtures:
+        server = standin.StandIn(standin.load_fixtures(args.fixtures))
+    elif args.record:
+        server = standin.StandIn(record=True)
+    else:
+        synthetic = standin.SyntheticWikidata()
+        server = standin.StandIn(synthetic=synthetic)
+    server.start()
+    base.BaseProvider.WD_API = server.url + urlsplit(base.BaseProvider.WD_API).path
+    base.SparqlBase.SPARQL_API = server.url + urlsplit(base.SparqlBase.SPARQL_API).path
+    ptable.element_provider_class = chemistry.SparqlElementProvider
+    ptable.nuclide_provider_class = nuclides.SparqlNuclideProvider
+    client = ptable.app.test_client()
+
+    results = {'python': platform.python_version(),
+               'implementation': platform.python_implementation(),
+               'platform': platform.platform(),
+               'fixtures': args.fixtures or args.record or 'synthetic',
+               'stages': {}}
+    try:
+        for name, func, reset in get_stages(client, synthetic):
+            if args.stages and not any(fnmatch.fnmatch(name, stage) for stage in args.stages):
+                continue
+            logger.info('Running %s', name)
+            try:
+                results['stages'][name] = measure(func, reset, args.repeat)
+            except Exception as e:
+                logger.exception('Stage %s failed', name)
+                results['stages'][name] = {'error': repr(e)}
+    finally:
+        server.stop()
+    results['upstream_requests'] = server.requests
+    results['missing_fixtures'] = len(server.misses)
+    if args.record:
+        standin.save_fixtures(args.record, server.fixtures)
+        logger.warning('Recorded %d responses to %s', len(server.fixtures), args.record)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    failed = [name for name, result in results['stages'].items() if 'error' in result]
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for name, before, after, ratio in compare(results, baseline, args.threshold):
+            logger.warning('%s is slower: %.6fs instead of %.6fs (x%.2f)',
+                           name, after, before, ratio)
+            failed.append(name)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
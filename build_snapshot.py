@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import logging
+import os
+
+import chemistry
+import nuclides
+import shared
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def build(languages, element_provider_class=chemistry.SparqlElementProvider,
+          nuclide_provider_class=nuclides.SparqlNuclideProvider):
+    """Return the data of a snapshot file, fetched from Wikidata by the providers."""
+    elements = list(element_provider_class())
+    ids = [element.item_id for element in elements]
+    labels = {}
+    for language in languages:
+        logger.info('Loading the labels in %s', language)
+        labels[language] = element_provider_class(language).get_labels(ids)
+    provider = nuclide_provider_class()
+    nuclide_list = list(provider)
+    return {'elements': [element.to_dict() for element in elements],
+            'labels': labels,
+            'languages': element_provider_class.get_available_languages(),
+            'nuclides': [dict(nuclide, classes=nuclide.classes) for nuclide in nuclide_list],
+            'magic_numbers': provider.get_magic_numbers()}
+
+
+def patch(records, ids, fresh):
+    """
+    Return the records, with the ones of the items in ids replaced by the fresh ones.
+
+    The fresh records of other items are left out, as the providers may return more
+    items than the ones asked for, which are already in the records.
+    """
+    ids = set(ids)
+    return ([record for record in records if record['item_id'] not in ids] +
+            [record for record in fresh if record['item_id'] in ids])
+
+
+def removed_ids(records, current_ids):
+    """Return the ids of the records whose items are not among the current ones anymore."""
+    current_ids = set(current_ids)
+    return [record['item_id'] for record in records if record['item_id'] not in current_ids]
+
+
+def update(data, since, max_items=500, element_provider_class=chemistry.SparqlElementProvider,
+           nuclide_provider_class=nuclides.SparqlNuclideProvider):
+    """
+    Patch the data of a snapshot file with the items modified after since (a timestamp).
+
+    Only the modified items are fetched again, and the items which were deleted,
+    redirected or reclassified are removed. Return the ids of the updated items,
+    or None if more than max_items were modified, when a full build is cheaper.
+    """
+    element_ids = element_provider_class.get_modified_since(since)
+    nuclide_ids = nuclide_provider_class.get_modified_since(since)
+    if len(element_ids) + len(nuclide_ids) > max_items:
+        return None
+    # the items not matched anymore are not reported as modified, nor fetched again
+    element_ids += removed_ids(data['elements'], element_provider_class.get_all_ids())
+    nuclide_ids += removed_ids(data['nuclides'], nuclide_provider_class.get_all_ids())
+    if element_ids:
+        provider = element_provider_class()
+        provider.item_ids = element_ids
+        data['elements'] = patch(data['elements'], element_ids,
+                                 [element.to_dict() for element in provider])
+        kept = {element['item_id'] for element in data['elements']}
+        for language, labels in data['labels'].items():
+            for item_id in element_ids:
+                labels.pop(item_id, None)
+            labels.update(element_provider_class(language).get_labels(
+                [item_id for item_id in element_ids if item_id in kept]))
+    provider = nuclide_provider_class()
+    if nuclide_ids:
+        provider.item_ids = nuclide_ids
+        data['nuclides'] = patch(data['nuclides'], nuclide_ids,
+                                 [dict(nuclide, classes=nuclide.classes)
+                                  for nuclide in provider])
+    magic_numbers = provider.get_magic_numbers()
+    if magic_numbers:
+        data['magic_numbers'] = magic_numbers
+    else:
+        logger.warning('Could not load the magic numbers, keeping the previous ones')
+    return element_ids + nuclide_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build a snapshot file of the Wikidata periodic table, to be loaded by '
+                    'SnapshotElementProvider and SnapshotNuclideProvider.')
+    parser.add_argument('path', nargs='?', default=snapshot.SnapshotFileBase.SNAPSHOT_PATH,
+                        help='file to write (default: %(default)s)')
+    parser.add_argument('-l', '--language', action='append', dest='languages', metavar='LANG',
+                        help='language of the labels to include, can be repeated '
+                             '(default: en)')
+    parser.add_argument('-u', '--update', action='store_true',
+                        help='only fetch the items modified since the existing file was built, '
+                             'keeping its languages')
+    parser.add_argument('--margin', type=int, default=3600,
+                        help='seconds of edits before the build of the existing file to fetch '
+                             'again, as the query service lags behind (default: %(default)s)')
+    parser.add_argument('-s', '--shared', metavar='PATH',
+                        help='also write the snapshot to be mapped by SharedElementProvider '
+                             'and SharedNuclideProvider')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    data = None
+    if args.update and os.path.exists(args.path):
+        header, data = snapshot.read_file(args.path)
+        updated = update(data, header['created'] - args.margin)
+        if updated is None:
+            logger.info('Too many items modified, building the snapshot again')
+            data = None
+        else:
+            logger.info('Updated %d items', len(updated))
+    if data is None:
+        data = build(args.languages or ['en'])
+    header = snapshot.write_file(args.path, data)
+    logger.info('Wrote snapshot %s to %s', header['version'], args.path)
+    if args.shared:
+        shared.write(args.shared, data)
+        logger.info('Wrote shared snapshot to %s', args.shared)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from cachetools import LRUCache
+
+
+class BaseCache:
+    """Base class for the caches of upstream responses."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(*args):
+        return json.dumps(args)
+
+    def get(self, key, allow_stale=False, newer_than=None):
+        """
+        Return the value stored for key, or None if missing or expired (unless allowed).
+
+        If newer_than is set, values stored before that time are also ignored.
+        """
+        raise NotImplementedError()
+
+    def is_older(self, expires, newer_than):
+        """Whether the value expiring at expires was stored before newer_than, if set."""
+        return newer_than is not None and expires - self.ttl < newer_than
+
+    def set(self, key, value):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    def locked(self, key, timeout=60):
+        """Return a context manager keeping other processes from fetching key meanwhile."""
+        return nullcontext()
+
+
+class MemoryCache(BaseCache):
+    """Per-process cache, evicting the least recently used entries."""
+
+    def __init__(self, maxsize=200, ttl=21600):
+        super(MemoryCache, self).__init__(maxsize, ttl)
+        self.entries = LRUCache(maxsize=maxsize)
+        self.lock = threading.Lock()
+
+    def get(self, key, allow_stale=False, newer_than=None):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or (entry[0] < time.time() and not allow_stale) or (
+                self.is_older(entry[0], newer_than)):
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SqliteCache(BaseCache):
+    """
+    Cache stored in a SQLite database.
+
+    The database can be shared by all the worker processes and survives restarts.
+    Values are stored as JSON, so only JSON-serializable values can be cached.
+    The access times used to evict the least recently used entries are only updated
+    by the hits once they are access_interval seconds old, so most hits only read.
+    """
+
+    def __init__(self, path, maxsize=1000, ttl=21600, lock_interval=0.2, access_interval=60):
+        super(SqliteCache, self).__init__(maxsize, ttl)
+        self.path = path
+        self.access_interval = access_interval
+        self.lock_interval = lock_interval
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                         'expires REAL NOT NULL, accessed REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            conn.execute('CREATE TABLE IF NOT EXISTS locks ('
+                         'key TEXT PRIMARY KEY, expires REAL NOT NULL)')
+
+    def connect(self):
+        """Return the connection of the current thread, opening it if needed."""
+        # connections must not be shared between threads nor inherited by forked workers
+        if getattr(self.local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return self.local.conn
+
+    def get(self, key, allow_stale=False, newer_than=None):
+        conn = self.connect()
+        now = time.time()
+        with conn:
+            row = conn.execute('SELECT value, expires, accessed FROM cache WHERE key = ?',
+                               (key,)).fetchone()
+            if row is None or (row[1] < now and not allow_stale) or (
+                    self.is_older(row[1], newer_than)):
+                return None
+            if row[2] < now - self.access_interval:
+                conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        conn = self.connect()
+        now = time.time()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                         'VALUES (?, ?, ?, ?)', (key, json.dumps(value), now + self.ttl, now))
+            conn.execute('DELETE FROM cache WHERE key IN ('
+                         'SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                         (self.maxsize,))
+
+    def clear(self):
+        conn = self.connect()
+        with conn:
+            conn.execute('DELETE FROM cache')
+
+    @contextmanager
+    def locked(self, key, timeout=60):
+        """
+        Hold a lock on key, shared by all the processes using the database.
+
+        The lock expires after timeout seconds, in case its process died meanwhile,
+        and after waiting that long for it the block runs anyway.
+        """
+        conn = self.connect()
+        deadline = time.time() + timeout
+        acquired = False
+        while True:
+            now = time.time()
+            with conn:
+                conn.execute('DELETE FROM locks WHERE key = ? AND expires < ?', (key, now))
+                acquired = conn.execute('INSERT OR IGNORE INTO locks (key, expires) VALUES (?, ?)',
+                                        (key, now + timeout)).rowcount == 1
+            if acquired or now >= deadline:
+                break
+            time.sleep(self.lock_interval)
+        try:
+            yield
+        finally:
+            if acquired:
+                with conn:
+                    conn.execute('DELETE FROM locks WHERE key = ?', (key,))
@@ -20,84 +20,101 @@ along with the Wikidata periodic table.  If not, see <http://www.gnu.org/license
 
 import operator
 from collections import defaultdict
+from types import MappingProxyType
 
 import data
 from base import BaseProvider, PropertyAlreadySetException, SparqlBase, TableCell, get_json
+from shared import RecordCell, SharedFileBase, view_field
+from snapshot import SnapshotFileBase
 
 
 class ElementProvider(BaseProvider):
     """Base class for element providers."""
 
-    def get_table(self):
-        table = {}
-        specials = {}
+    def get_table(self, records=None):
+        """
+        Return the elements, the table, the special series and the incomplete elements.
+
+        The table is built from records if given, otherwise from all the elements of the
+        provider. It is read-only and made of immutable cells, so it can be shared,
+        and so are the lists of elements, which are tuples.
+        """
+        cells = {}
+        specials = defaultdict(dict)
         elements = []
         incomplete = []
-        for element in iter(self):
-            if element.symbol and element.number and element.period:
+        for element in iter(self) if records is None else records:
+            if element.symbol and element.number and element.period and (
+                    element.group or element.special):
+                cell = ElementCell.freeze(element)
                 if element.group:
-                    if element.period not in table:
-                        table[element.period] = {}
-                    table[element.period][element.group] = element
-                    elements.append(element)
-                    continue
-                elif element.special:
-                    if element.period not in specials:
-                        specials[element.period] = {}
-                    specials[element.period][element.number] = element
-                    elements.append(element)
-                    continue
-            incomplete.append(element)
+                    cells[element.period, element.group] = cell
+                else:
+                    specials[element.period][element.number] = cell
+                elements.append(cell)
+            else:
+                incomplete.append(ElementCell.freeze(element))
         lastnum = -1
         elements.sort(key=operator.attrgetter('number'))
-        for pindex, pitem in enumerate(data.periods):
-            period = pindex + 1
-            if period not in table:
-                table[period] = {}
-            for gindex, gitem in enumerate(data.groups):
-                group = gindex + 1
-                if group in table[period]:
-                    table[period][group].__class__ = ElementCell  # XXX
-                    lastnum += 1
-                elif len(elements) > lastnum + 1:
-                    last_el = elements[lastnum]
-                    next_el = elements[lastnum + 1]
-                    if next_el.number - last_el.number == 1:
-                        if next_el.special is not None and next_el.special != last_el.special:
-                            table[period][group] = IndicatorCell(
-                                next_el.special - data.special_start + 1)
-                            lastnum += len(specials[next_el.period])
-                        else:
-                            table[period][group] = EmptyCell()
+        table = {}
+        for period, group in layout:
+            row = table.setdefault(period, {})
+            if (period, group) in cells:
+                row[group] = cells[period, group]
+                lastnum += 1
+            elif len(elements) > lastnum + 1:
+                last_el = elements[lastnum]
+                next_el = elements[lastnum + 1]
+                if next_el.number - last_el.number == 1:
+                    if next_el.special is not None and next_el.special != last_el.special:
+                        row[group] = IndicatorCell(next_el.special - data.special_start + 1)
+                        lastnum += len(specials[next_el.period])
                     else:
-                        table[period][group] = UnknownCell()
+                        row[group] = empty_cell
                 else:
-                    table[period][group] = EmptyCell()
+                    row[group] = unknown_cell
+            else:
+                row[group] = empty_cell
         special_series = {}
         for sindex, sitem in enumerate(data.special_series):
             period = sindex + data.special_start
-            special_series[sindex] = [IndicatorCell(sindex + 1)]
-            if period in specials:
-                for i in sorted(specials[period].keys()):
-                    specials[period][i].__class__ = ElementCell  # XXX
-                    special_series[sindex].append(specials[period][i])
+            special_series[sindex] = (IndicatorCell(sindex + 1),) + tuple(
+                specials[period][number] for number in sorted(specials.get(period, ())))
 
-        sorted_table = {}
-        for p in sorted(table.keys()):
-            row = table[p]
-            sorted_row = {}
-            for g in sorted(row.keys()):
-                sorted_row[g] = row[g]
-            sorted_table[p] = sorted_row
+        # the layout is already sorted by period and group
+        table = MappingProxyType({period: MappingProxyType(row) for period, row in table.items()})
+        return tuple(elements), table, MappingProxyType(special_series), tuple(incomplete)
 
-        return elements, sorted_table, special_series, incomplete
+    @staticmethod
+    def get_index(elements, fields=('period', 'group', 'special')):
+        """Return the positions of the elements by field and value, to filter them quickly."""
+        index = {field: defaultdict(list) for field in fields}
+        for position, element in enumerate(elements):
+            for field in fields:
+                index[field][getattr(element, field)].append(position)
+        return {field: dict(positions) for field, positions in index.items()}
 
 
 class SparqlElementProvider(SparqlBase, ElementProvider):
     """Load elements from Wikidata Sparql endpoint."""
+
+    @staticmethod
+    def get_item_pattern():
+        return '?item wdt:P{0} wd:Q{1} .'.format(Element.instance_pid, Element.element_qid)
+
+    @classmethod
+    def get_modified_since(cls, since):
+        """Return the ids of the elements modified after since (a timestamp)."""
+        return cls.get_modified_items(cls.get_item_pattern(), since)
+
+    @classmethod
+    def get_all_ids(cls):
+        """Return the ids of all the elements."""
+        return cls.get_items(cls.get_item_pattern())
+
     def __iter__(self):
         query = 'SELECT ?item ?symbol ?number (group_concat(?subclass_of) as ?subclasses_of) \
-WHERE {{ \
+WHERE {{ {values}\
     ?item wdt:P{instance_pid} wd:Q{element_qid} ; wdt:P{symbol_pid} ?symbol . \
     OPTIONAL {{ \
         ?item wdt:P{partof_pid}|wdt:P{subclass_pid} ?subclass_of \
@@ -111,12 +128,9 @@ GROUP BY ?item ?symbol ?number'.format(symbol_pid=Element.symbol_pid,
                                        partof_pid=Element.partof_pid,
                                        number_pid=Element.number_pid,
                                        instance_pid=Element.instance_pid,
-                                       element_qid=Element.element_qid)
+                                       element_qid=Element.element_qid,
+                                       values=self.get_values_clause('item'))
         items = self.get_sparql(query)
-        ids = [item['item']['value'].replace('http://www.wikidata.org/entity/', '')
-               for item in items]
-        entities = self.get_entities(ids, props='labels',
-                                     languages=self.language, languagefallback=1)
         for item in items:
             element = Element()
             element.item_id = item['item']['value'].replace('http://www.wikidata.org/entity/', '')
@@ -134,20 +148,58 @@ GROUP BY ?item ?symbol ?number'.format(symbol_pid=Element.symbol_pid,
             else:
                 subclass_of = []
             element.load_data_from_superclasses(subclass_of)
-            label = None
-            entity = entities.get(element.item_id)
-            if entity and 'labels' in entity and len(entity['labels']) == 1:
-                label = list(entity['labels'].values())[0]['value']
-            element.label = label
+            element.label = None  # see get_labels()
             yield element
 
 
+class SnapshotElementProvider(SnapshotFileBase, ElementProvider):
+    """Load elements from a snapshot file, without any request to Wikidata."""
+
+    # language of the labels used for the languages which are not in the snapshot
+    fallback_language = 'en'
+
+    @classmethod
+    def get_available_languages(cls):
+        # only the languages of the labels in the snapshot, the other ones would be fetched
+        return sorted(cls.get_snapshot_data()['labels'])
+
+    def __iter__(self):
+        for values in self.get_snapshot_data()['elements']:
+            element = Element(**values)
+            element.classes.extend(values['classes'])
+            yield element
+
+    def get_snapshot_labels(self):
+        """Return the labels in the provider language, or the fallback one if not included."""
+        labels = self.get_snapshot_data()['labels']
+        if self.language in labels:
+            return labels[self.language]
+        return labels.get(self.fallback_language, {})
+
+    def get_labels(self, ids):
+        labels = self.get_snapshot_labels()
+        return {item_id: labels[item_id] for item_id in ids if item_id in labels}
+
+
+class SharedElementProvider(SharedFileBase, SnapshotElementProvider):
+    """Load elements from a shared snapshot, mapped by all the worker processes."""
+
+    def __iter__(self):
+        # the cells are views of the shared snapshot, their values are not copied
+        records = self.get_snapshot_data()['elements']
+        for index in range(len(records)):
+            yield ElementView.view(records, index)
+
+    def get_labels(self, ids):
+        # the labels are read from the shared snapshot instead of being copied
+        return self.get_snapshot_labels()
+
+
 class ApiElementProvider(ElementProvider):
     """Load elements from the Wikidata API."""
     def __iter__(self):
         ids = self.get_elements_titles()
-        entities = self.get_entities(ids, props='labels|claims',
-                                     languages=self.language, languagefallback=1)
+        entities = self.get_entities(ids, props='claims')
         for item_id, item in entities.items():
             try:
                 element = self.factory(item)
@@ -205,6 +257,7 @@ class ApiElementProvider(ElementProvider):
 class Element:
 
     props = ('number', 'symbol', 'item_id', 'label', 'period', 'group', 'special')
+    __slots__ = props + ('classes',)
     instance_pid = 31
     element_qid = 11344
     symbol_pid = 246
@@ -214,10 +267,10 @@ class Element:
     number_pid = 1086
 
     def __init__(self, **kwargs):
-        for key, val in kwargs.items():
-            if key in self.props:
-                setattr(self, key, val)
-        self.classes = []
+        # a new element has nothing set yet, so there is nothing to check
+        for key in self.props:
+            object.__setattr__(self, key, kwargs.get(key))
+        object.__setattr__(self, 'classes', [])
 
     def load_data_from_superclasses(self, targets):
         period = None
@@ -237,11 +290,15 @@ class Element:
         self.special = special
 
     def __setattr__(self, key, value):
-        if (key in self.props and hasattr(self, key) and
-                getattr(self, key) is not None and getattr(self, key) != value):
-            raise PropertyAlreadySetException
+        if key in self.props:
+            current = getattr(self, key)
+            if current is not None and current != value:
+                raise PropertyAlreadySetException
         super(Element, self).__setattr__(key, value)
 
+    def to_dict(self):
+        return dict(self, classes=self.classes)
+
     def __iter__(self):
         for key in self.props:
             yield (key, getattr(self, key))
@@ -249,17 +306,47 @@ class Element:
 
 class ElementCell(Element, TableCell):
     """An element cell."""
+    __slots__ = ()
+    __setattr__ = TableCell.__setattr__
+
+
+class ElementView(RecordCell, ElementCell):
+    """An element cell, reading its values from a shared snapshot when accessed."""
+    __slots__ = ('records', 'index')
+    number = view_field('number')
+    symbol = view_field('symbol')
+    item_id = view_field('item_id')
+    label = view_field('label')
+    period = view_field('period')
+    group = view_field('group')
+    special = view_field('special')
+    classes = view_field('classes')
 
 
 class IndicatorCell(TableCell):
     """An indicator cell."""
+    __slots__ = ('index',)
+
     def __init__(self, index):
-        self.index = index
+        object.__setattr__(self, 'index', index)
+
+    def to_dict(self):
+        return {'index': self.index}
 
 
 class UnknownCell(TableCell):
     """An unknown cell."""
+    __slots__ = ()
 
 
 class EmptyCell(TableCell):
     """An empty cell."""
+    __slots__ = ()
+
+
+empty_cell = EmptyCell()
+unknown_cell = UnknownCell()
+
+# positions of the table cells, by period and group
+layout = [(period, group) for period in range(1, len(data.periods) + 1)
+          for group in range(1, len(data.groups) + 1)]
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+from urllib.parse import parse_qsl, urlsplit
+
+import flask
+
+import app as ptable
+import chemistry
+import nuclides
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+# language of the pages at the top of the output directory
+default_language = 'en'
+
+# suffixes of the precompressed copies, by content encoding
+suffixes = {'gzip': '.gz', 'br': '.br'}
+
+# pages which do not depend on the language: file, URL and the inputs they are built from
+common_pages = [
+    ('index.html', '/?lang=' + default_language, ['elements', 'labels']),
+    ('nuclides.html', '/nuclides', ['nuclides']),
+    ('nuclide_decays.html', '/nuclide_decays', ['nuclides']),
+    ('nuclides_tiles.html', '/nuclides?render=tiles', ['nuclides']),
+    ('license.html', '/license', []),
+    ('license.txt', '/license/full', ['license']),
+    ('api.html', '/api', []),
+    ('api/nuclides.json', '/api/nuclides', ['nuclides']),
+    ('api/nuclides.bin', '/api/nuclides?format=binary', ['nuclides']),
+]
+
+# pages in each language, below a directory named after it
+language_pages = [
+    ('index.html', '/', ['elements', 'labels']),
+    ('api/elements.json', '/api?props=elements', ['elements', 'labels']),
+    ('api/incomplete.json', '/api?props=incomplete', ['elements', 'labels']),
+    ('api/all.json', '/api?props=elements&props=incomplete', ['elements', 'labels']),
+    ('api/group1.json', '/api?props=elements&fields=number,symbol&group=1',
+     ['elements', 'labels']),
+]
+
+
+def get_tile_pages():
+    """Return the tiles of the chart of the nuclides, exported like the common pages."""
+    table = ptable.latest(ptable.snapshots, ptable.build_nuclides).data[1]
+    pages = []
+    for zoom in range(nuclides.tile_zoom_levels):
+        span = nuclides.tile_blocks * 2 ** (nuclides.tile_zoom_levels - 1 - zoom)
+        for x in range(table.max_neutron_number // span + 1):
+            for y in range(table.max_atomic_number // span + 1):
+                url = '/nuclides/tiles/{0}/{1}/{2}'.format(zoom, x, y)
+                pages.append((url[1:], url, ['nuclides']))
+    return pages
+
+
+def link_key(url):
+    """Return the path and the parameters of url, other than the language, in any order."""
+    parts = urlsplit(url)
+    return parts.path, tuple(sorted((key, value) for key, value in parse_qsl(parts.query)
+                                    if key != 'lang'))
+
+
+def url_for(endpoint, **values):
+    """
+    Return the URL of the page, linking to its exported file instead if there is one.
+
+    The pages in a language link to the other pages in that language, the common pages
+    to the ones in the default language. The files are linked from the top of the site.
+    """
+    url = flask.url_for(endpoint, **values)
+    language = flask.request.args.get('lang')
+    common = [('/' + name, page_url) for name, page_url, inputs in common_pages]
+    in_language = [('/{0}/{1}'.format(language or default_language, name), page_url)
+                   for name, page_url, inputs in language_pages]
+    key = link_key(url)
+    for path, page_url in in_language + common if language else common + in_language:
+        if link_key(page_url) == key:
+            return path
+    # the static files and the tiles are exported at their own URL
+    return url
+
+
+def get_default_languages(from_snapshot):
+    """Return the languages to export by default."""
+    if from_snapshot:
+        # only the ones with labels in the snapshot, the other ones would be fetched
+        return sorted(ptable.element_provider_class.get_snapshot_data()['labels'])
+    return ptable.element_provider_class.get_available_languages()
+
+
+def get_versions(language=None):
+    """Return the versions of the inputs the pages are built from, by name."""
+    with open(os.path.join(ptable.app.root_path, 'COPYING'), 'rb') as f:
+        license_version = snapshot.fingerprint([f.read()])
+    return {'elements': ptable.latest(ptable.snapshots, ptable.build_elements).version,
+            'nuclides': ptable.latest(ptable.snapshots, ptable.build_nuclides).version,
+            'labels': ptable.latest(ptable.label_snapshots, ptable.build_labels,
+                                    language or default_language).version,
+            'license': license_version}
+
+
+def write(path, body):
+    """Write the file and its precompressed copies, replacing the previous ones atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    copies = [(path, body)] + [(path + suffixes[encoding], compress(body))
+                               for encoding, compress in ptable.compressors.items()]
+    for copy_path, content in copies:
+        temp_path = '{0}.{1}.tmp'.format(copy_path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, copy_path)
+
+
+def export(output, pages, language, manifest, force=False):
+    """
+    Render the pages whose inputs changed since they were exported, and write them.
+
+    The inputs of a page are its URL, the versions of the snapshots it is built from
+    and the templates. Return the fingerprints of the inputs of all the pages, by file.
+    """
+    client = ptable.app.test_client()
+    versions = get_versions(language)
+    prefix = language + '/' if language else ''
+    fingerprints = {}
+    for name, url, inputs in pages:
+        if language:
+            url += ('&' if '?' in url else '?') + 'lang=' + language
+        fingerprint = snapshot.fingerprint(
+            [url, ptable.static_pages.version] + [versions[key] for key in inputs])
+        path = os.path.join(output, prefix + name)
+        fingerprints[prefix + name] = fingerprint
+        if not force and manifest.get(prefix + name) == fingerprint and os.path.exists(path):
+            continue
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError('{0} returned {1}'.format(url, response.status_code))
+        write(path, response.get_data())
+        response.close()
+        logger.info('Exported %s', prefix + name)
+    return fingerprints
+
+
+def export_language(args):
+    output, language, manifest, force = args
+    try:
+        return language, export(output, language_pages, language, manifest, force)
+    except Exception:
+        logger.exception('Could not export the pages in %s', language)
+        return language, None
+
+
+def load_manifest(output):
+    try:
+        with open(os.path.join(output, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(output, manifest):
+    path = os.path.join(output, MANIFEST)
+    temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export the pages and the API results in every language as static files, '
+                    'along with their precompressed copies, to be served without Flask from '
+                    'the top of a site (for example with python -m http.server -d OUTPUT). '
+                    'The pages link to each other\'s files, in the same language.')
+    parser.add_argument('output', help='directory to write the files to')
+    parser.add_argument('-l', '--language', action='append', dest='languages', metavar='LANG',
+                        help='language to export, can be repeated (default: all the languages '
+                             'available on Wikidata, or the ones of the labels in the snapshot '
+                             'with --snapshot)')
+    parser.add_argument('-s', '--snapshot', metavar='PATH',
+                        help='build the pages from this snapshot file written by '
+                             'build_snapshot.py, instead of fetching the data from Wikidata')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='worker processes exporting the languages (default: %(default)s)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='render all the pages again, even if their inputs did not change')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.snapshot:
+        snapshot.SnapshotFileBase.SNAPSHOT_PATH = os.path.abspath(args.snapshot)
+        ptable.element_provider_class = chemistry.SnapshotElementProvider
+        ptable.nuclide_provider_class = nuclides.SnapshotNuclideProvider
+    languages = args.languages or get_default_languages(bool(args.snapshot))
+    if default_language not in languages:
+        # linked from the common pages
+        languages.append(default_language)
+    manifest = load_manifest(args.output)
+    ptable.app.jinja_env.globals['url_for'] = url_for
+
+    # the snapshots shared by all the languages are built once, before forking the workers
+    # the languages not exported this time are kept as they are
+    fingerprints = dict(manifest)
+    fingerprints.update(export(args.output, common_pages + get_tile_pages(), None, manifest,
+                               args.force))
+    shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'),
+                    os.path.join(args.output, 'static'), dirs_exist_ok=True)
+    failed = []
+    tasks = [(args.output, language, {key: value for key, value in manifest.items()
+                                      if key.startswith(language + '/')}, args.force)
+             for language in languages]
+    with multiprocessing.get_context('fork').Pool(args.jobs) as pool:
+        for language, exported in pool.imap_unordered(export_language, tasks):
+            if exported is None:
+                # left out of the manifest, so its pages are all exported again next time
+                failed.append(language)
+                exported = {}
+            for key in [key for key in fingerprints if key.startswith(language + '/')]:
+                del fingerprints[key]
+            fingerprints.update(exported)
+    save_manifest(args.output, fingerprints)
+    if failed:
+        logger.error('Could not export the pages in %s', ', '.join(sorted(failed)))
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
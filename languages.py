@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from cachetools import LRUCache
+from werkzeug.datastructures import LanguageAccept
+from werkzeug.http import parse_accept_header
+
+import base
+import data
+
+logger = logging.getLogger(__name__)
+
+
+class LanguageIndex:
+    """
+    Negotiate the language of requests against the available languages.
+
+    The bundled list of languages is used until loader() returns the up-to-date one,
+    which is then reloaded in the background every interval seconds.
+    """
+
+    def __init__(self, loader, interval=21600, maxsize=1000):
+        self.loader = loader
+        self.interval = interval
+        self.languages = list(data.languages)
+        self.matches = LRUCache(maxsize=maxsize)
+        self.lock = threading.Lock()
+        self.pid = None
+        # when the languages were last loaded, see load()
+        self.loaded = 0
+
+    def negotiate(self, header):
+        """Return the best available language for an Accept-Language header, if any."""
+        self.start()
+        # reading the cache also updates its order, so it is locked like the writes
+        with self.lock:
+            if header in self.matches:
+                return self.matches[header]
+            languages = self.languages
+        match = parse_accept_header(header, LanguageAccept).best_match(languages)
+        with self.lock:
+            # unless the languages were loaded again meanwhile
+            if self.languages is languages:
+                self.matches[header] = match
+        return match
+
+    def load(self):
+        loaded = time.time()
+        try:
+            # the languages loaded by other processes since the last time are reused
+            with base.refreshing(self.loaded):
+                languages = self.loader()
+        except Exception:
+            logger.exception('Could not load the available languages')
+            return
+        if languages:
+            with self.lock:
+                self.languages = languages
+                self.loaded = loaded
+                self.matches.clear()
+
+    def start(self):
+        """Start loading the languages in the current process if not done yet."""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            self.load()
+            time.sleep(self.interval)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Set to True to collect the metrics, see render() and server_timing()
+enabled = False
+
+_state = threading.local()
+_disabled = nullcontext()
+
+default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, str(value).replace('\\', r'\\')
+                                             .replace('"', r'\"').replace('\n', r'\n'))
+                          for name, value in pairs) + '}'
+
+
+class Counter:
+    """A value that only goes up, by label values."""
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = defaultdict(int)
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] += amount
+
+    def render(self):
+        yield '# HELP {0} {1}'.format(self.name, self.description)
+        yield '# TYPE {0} counter'.format(self.name)
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield '{0}{1} {2}'.format(self.name, format_labels(self.labels, labels), value)
+
+
+class Histogram:
+    """The distribution of observed values, counted in cumulative buckets by label values."""
+
+    def __init__(self, name, description, labels=(), buckets=default_buckets):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.counts = {}
+        self.sums = defaultdict(float)
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, *labels):
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.counts.get(labels)
+            if counts is None:
+                # the last count is for the values above all the buckets
+                counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            counts[position] += 1
+            self.sums[labels] += value
+
+    def render(self):
+        yield '# HELP {0} {1}'.format(self.name, self.description)
+        yield '# TYPE {0} histogram'.format(self.name)
+        with self.lock:
+            values = sorted((labels, list(counts), self.sums[labels])
+                            for labels, counts in self.counts.items())
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '{0}_bucket{1} {2}'.format(self.name, format_labels(
+                    self.labels, labels, [('le', '+Inf' if bound == float('inf') else bound)]),
+                    cumulative)
+            yield '{0}_sum{1} {2}'.format(self.name, format_labels(self.labels, labels), total)
+            yield '{0}_count{1} {2}'.format(self.name, format_labels(self.labels, labels),
+                                            cumulative)
+
+
+registry = []
+
+upstream_seconds = Histogram('ptable_upstream_request_seconds',
+                             'Time waiting for upstream responses.', ('endpoint',))
+upstream_bytes = Counter('ptable_upstream_response_bytes_total',
+                         'Size of the upstream responses.', ('endpoint',))
+upstream_cache = Counter('ptable_upstream_cache_total',
+                         'Lookups of upstream responses in the cache, by result.', ('result',))
+stage_seconds = Histogram('ptable_stage_seconds',
+                          'Time spent in each stage of building the pages.', ('stage',))
+request_seconds = Histogram('ptable_request_seconds',
+                            'Time until the response is ready to be sent, by route.', ('route',))
+
+
+def render():
+    """Return the metrics in the Prometheus text format."""
+    return ''.join(line + '\n' for metric in registry for line in metric.render())
+
+
+def start_timings():
+    """Start collecting the timings of the current request, see server_timing()."""
+    _state.timings = defaultdict(float)
+
+
+def get_timings():
+    """Return the timings of the current request, to be shared with other threads."""
+    return getattr(_state, 'timings', None)
+
+
+def use_timings(timings):
+    """Add the timings of the current thread to those returned by get_timings()."""
+    _state.timings = timings
+
+
+def stop_timings():
+    timings = get_timings()
+    _state.timings = None
+    return timings
+
+
+def server_timing(timings):
+    """Return the timings as a Server-Timing header value, in milliseconds."""
+    return ', '.join('{0};dur={1:.1f}'.format(name, duration * 1000)
+                     for name, duration in timings.items())
+
+
+def count(counter, *labels, amount=1):
+    """Increase the counter with the given labels, unless disabled."""
+    if enabled:
+        counter.inc(*labels, amount=amount)
+
+
+def record(histogram, name, duration, *labels):
+    histogram.observe(duration, *(labels or (name,)))
+    timings = get_timings()
+    if timings is not None:
+        timings[name] += duration
+
+
+@contextmanager
+def _timed(histogram, name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(histogram, name, time.perf_counter() - start, *labels)
+
+
+def timed(name, *labels, histogram=stage_seconds):
+    """
+    Return a context manager recording the time spent within it.
+
+    The time is observed by histogram with the given labels (by default name) and
+    added to the timing of name for the current request. Nothing is done if disabled.
+    """
+    if not enabled:
+        return _disabled
+    return _timed(histogram, name, labels)
+
+
+def timed_chunks(name, chunks):
+    """Yield the chunks, recording the time spent generating them once all are."""
+    if not enabled:
+        yield from chunks
+        return
+    duration = 0
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        duration += time.perf_counter() - start
+        if chunk is None:
+            break
+        yield chunk
+    # the response has already been sent, so this is only observed by the histogram
+    stage_seconds.observe(duration, name)
@@ -19,104 +19,236 @@ You should have received a copy of the GNU General Public License
 along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import bisect
+import json
+import logging
 import operator
-from collections import defaultdict
+import sys
+from array import array
+from collections import Counter
+from functools import cached_property, partial
 
-from base import BaseProvider, SparqlBase, PropertyAlreadySetException, TableCell
+from base import (BaseProvider, SparqlBase, PropertyAlreadySetException, StreamedResult,
+                  TableCell, is_refreshing, map_concurrently)
+from shared import RecordCell, SharedFileBase, ViewList, view_field
+from snapshot import SnapshotFileBase
+
+logger = logging.getLogger(__name__)
+
+# lower limits (in seconds, sorted) of the half-life ranges and their classes
+half_life_limits = [0, 1.0e-18, 1.0e-15, 1.0e-12, 1.0e-9, 1.0e-6, 1.0e-3, 1.0e-2, 1.0e-1,
+                    1.0, 1.0e1, 1.0e2, 1.0e3, 1.0e6, 1.0e9]
+half_life_classes = ['hl1e-21', 'hl1e-18', 'hl1e-15', 'hl1e-12', 'hl1e-9', 'hl1e-6', 'hl1e-3',
+                     'hl1e-2', 'hl1e-1', 'hl1e0', 'hl1e1', 'hl1e2', 'hl1e3', 'hl1e6', 'hl1e9']
+
+decay_mode_classes = {
+    14646001: 'beta-minus',
+    18907407: 'double-beta',
+    1357356: 'positron-emission',
+    109910: 'electron-capture',
+    520827: 'double-electron-capture',
+    179856: 'alpha-decay',
+    898923: 'neutron-emission',
+    902157: 'proton-emission',
+    9253686: 'two-proton-emission',
+    21457313: 'three-proton-emission',
+    21456752: 'two-neutron-emission',
+    21457084: 'three-neutron-emission',
+    21457201: 'four-neutron emission',
+    21457421: 'double-alpha-decay',
+    146682: 'spontaneous-fission'
+}
+decay_modes = list(decay_mode_classes)
+
+# columns of the compact chart data, with their array typecodes and names for clients
+nuclide_columns = [('item_id', 'I', 'uint32'), ('atomic_number', 'H', 'uint16'),
+                   ('neutron_number', 'H', 'uint16'), ('half_life', 'b', 'int8'),
+                   ('decay_mode', 'b', 'int8'), ('stable', 'B', 'uint8')]
+
+# zoom levels of the tiles of the chart, the last one showing every nuclide, see get_tile()
+tile_zoom_levels = 4
+# blocks of nuclides along each side of a tile
+tile_blocks = 32
+
+
+def half_life_index(half_life):
+    """Return the index of the half-life range including half_life."""
+    return max(bisect.bisect_right(half_life_limits, half_life) - 1, 0)
+
+
+def column_values(nuclide):
+    """Return the values of the nuclide in the columns, in the order of nuclide_columns."""
+    decay_mode = nuclide.decay_modes[0] if nuclide.decay_modes else None
+    return (int(nuclide.item_id[1:]), nuclide.atomic_number, nuclide.neutron_number,
+            -1 if nuclide.half_life is None else half_life_index(nuclide.half_life),
+            decay_modes.index(decay_mode) if decay_mode in decay_mode_classes else -1,
+            'stable' in nuclide.classes)
+
+
+def dominant(values):
+    """Return the most common of the known (positive) values, the lowest if tied, or -1."""
+    counts = Counter(value for value in values if value >= 0)
+    return max(sorted(counts), key=counts.get, default=-1)
+
+
+def pack_columns(header, columns):
+    """
+    Return the header and the columns packed as little-endian binary data.
+
+    The data starts with the length of the JSON header as a 32-bit integer, followed by
+    the header itself padded to 4 bytes, which describes the columns following it.
+    Every column starts at a multiple of its item size, so it can be read as a typed array.
+    """
+    offset = 0
+    layout = []
+    for name, typecode, type_name in nuclide_columns:
+        layout.append({'name': name, 'type': type_name, 'offset': offset})
+        offset += len(columns[name]) * columns[name].itemsize
+    encoded = json.dumps(dict(header, count=len(columns['item_id']), columns=layout),
+                         separators=(',', ':')).encode('utf-8')
+    encoded += b' ' * (-len(encoded) % 4)
+    data = [len(encoded).to_bytes(4, 'little'), encoded]
+    for name, typecode, type_name in nuclide_columns:
+        column = columns[name]
+        if sys.byteorder != 'little':
+            column = array(typecode, column)
+            column.byteswap()
+        data.append(column.tobytes())
+    return b''.join(data)
 
 
 class NuclideProvider(BaseProvider):
     """Base class for nuclide providers."""
 
-    def get_table(self):
-        table = {}
-        nuclides = []
+    def get_table(self, records=None):
+        """
+        Return the nuclides, the chart and the incomplete ones, from records if given.
+
+        They are immutable cells in tuples, so they can be shared like the chart.
+        """
+        cells = {}
         incomplete = []
-        lastanum = -1
-        lastnnum = -1
-        for nuclide in iter(self):
+        for nuclide in iter(self) if records is None else records:
             if nuclide.atomic_number is not None and nuclide.neutron_number is not None:
-                if nuclide.atomic_number > lastanum:
-                    lastanum = nuclide.atomic_number
-                if nuclide.neutron_number > lastnnum:
-                    lastnnum = nuclide.neutron_number
-                if nuclide.atomic_number not in table:
-                    table[nuclide.atomic_number] = {}
-                table[nuclide.atomic_number][nuclide.neutron_number] = nuclide
-                nuclides.append(nuclide)
+                # the last of the nuclides with the same numbers is shown, as in the chart
+                cells[nuclide.atomic_number, nuclide.neutron_number] = NuclideCell.freeze(nuclide)
             else:
-                incomplete.append(nuclide)
-        nuclides.sort(key=operator.attrgetter('atomic_number', 'neutron_number'))
-        for anum in range(0, lastanum+1):
-            if anum not in table:
-                table[anum] = {}
-            for nnum in range(0, lastnnum+1):
-                if nnum in table[anum]:
-                    table[anum][nnum].__class__ = NuclideCell
-                else:
-                    table[anum][nnum] = NoneCell()
-
-        return nuclides, table, incomplete
-
-    def decorate_by_halflife(self, nuclides):
-        half_life_map = {
-            1.0e9: 'hl1e9',
-            1.0e6: 'hl1e6',
-            1.0e3: 'hl1e3',
-            1.0e2: 'hl1e2',
-            1.0e1: 'hl1e1',
-            1.0: 'hl1e0',
-            1.0e-1: 'hl1e-1',
-            1.0e-2: 'hl1e-2',
-            1.0e-3: 'hl1e-3',
-            1.0e-6: 'hl1e-6',
-            1.0e-9: 'hl1e-9',
-            1.0e-12: 'hl1e-12',
-            1.0e-15: 'hl1e-15',
-            1.0e-18: 'hl1e-18',
-            0: 'hl1e-21'}
+                incomplete.append(NuclideCell.freeze(nuclide))
+        nuclides = sorted(cells.values(), key=operator.attrgetter('atomic_number',
+                                                                  'neutron_number'))
+
+        return tuple(nuclides), NuclideGrid(cells), tuple(incomplete)
+
+    def get_classes(self, nuclides):
+        """
+        Return the CSS classes of each nuclide for every view.
+
+        The nuclides themselves are left unchanged, so they can be shared by all the views.
+        """
+        views = {'nuclides': self.decorate_by_halflife(nuclides),
+                 'nuclide_decays': self.decorate_by_decay_mode(nuclides)}
+        # the nuclides share the few distinct combinations of classes, instead of a tuple each
+        combinations = {}
+        return {view: tuple(combinations.setdefault(classes, classes) for classes in (
+                    tuple(nuclide.classes) + ((view_class,) if view_class else ())
+                    for nuclide, view_class in zip(nuclides, view_classes)))
+                for view, view_classes in views.items()}
+
+    @staticmethod
+    def decorate_by_halflife(nuclides):
+        """Return the half-life class of each nuclide, or None if unknown."""
+        classes = []
         for nuclide in nuclides:
             half_life = nuclide.half_life
-            if half_life is not None:
-                for hl_limit in sorted(half_life_map, reverse=True):
-                    if (half_life >= hl_limit):
-                        hl_class = half_life_map[hl_limit]
-                        break
-                if hl_class is None:
-                    hl_class = half_life_map[0]  # default value
-                nuclide.classes.append(hl_class)
-
-    def decorate_by_decay_mode(self, nuclides):
-        decay_modes_map = {
-            '14646001': 'beta-minus',
-            '18907407': 'double-beta',
-            '1357356': 'positron-emission',
-            '109910': 'electron-capture',
-            '520827': 'double-electron-capture',
-            '179856': 'alpha-decay',
-            '898923': 'neutron-emission',
-            '902157': 'proton-emission',
-            '9253686': 'two-proton-emission',
-            '21457313': 'three-proton-emission',
-            '21456752': 'two-neutron-emission',
-            '21457084': 'three-neutron-emission',
-            '21457201': 'four-neutron emission',
-            '21457421': 'double-alpha-decay',
-            '146682': 'spontaneous-fission'
-        }
+            if half_life is None:
+                classes.append(None)
+                continue
+            classes.append(half_life_classes[half_life_index(half_life)])
+        return classes
+
+    @staticmethod
+    def decorate_by_decay_mode(nuclides):
+        """Return the class of the main decay mode of each nuclide, or None if unknown."""
+        return [decay_mode_classes.get(nuclide.decay_modes[0]) if nuclide.decay_modes else None
+                for nuclide in nuclides]
+
+    @staticmethod
+    def get_column_classes():
+        """Return the CSS classes matching the indexes in the columns of get_columns()."""
+        return {'half_life_classes': half_life_classes,
+                'decay_mode_classes': [decay_mode_classes[decay_mode]
+                                       for decay_mode in decay_modes]}
+
+    @staticmethod
+    def get_columns(nuclides):
+        """
+        Return the chart data of the nuclides as arrays, by column name.
+
+        Half-lives and decay modes are indexes in half_life_classes and decay_modes,
+        or -1 if unknown.
+        """
+        columns = {name: array(typecode) for name, typecode, type_name in nuclide_columns}
         for nuclide in nuclides:
-            decay_modes = nuclide.decay_modes
-            if len(decay_modes) > 0:
-                dm = decay_modes[0]
-                if str(dm) in decay_modes_map:
-                    nuclide.classes.append(decay_modes_map[str(dm)])
+            for (name, typecode, type_name), value in zip(nuclide_columns,
+                                                          column_values(nuclide)):
+                columns[name].append(value)
+        return columns
+
+    @staticmethod
+    def get_tile(table, zoom, x, y):
+        """
+        Return the size of the blocks of a tile of the chart, and their columns.
+
+        At each zoom level, the chart is cut into square tiles of tile_blocks blocks per side,
+        x and y being the positions of the tile along the neutron and atomic numbers.
+        Blocks have 2 ** (tile_zoom_levels - 1 - zoom) nuclides per side, so at the last
+        level they are the nuclides themselves. Larger blocks have the most common
+        half-life and decay mode of their nuclides, 0 as item id and the numbers of their
+        first nuclide, and are stable if any of their nuclides is.
+        """
+        block = 2 ** (tile_zoom_levels - 1 - zoom)
+        span = block * tile_blocks
+        blocks = {}
+        for cell in table.band(y * span, (y + 1) * span - 1, x * span, (x + 1) * span - 1):
+            blocks.setdefault((cell.atomic_number // block, cell.neutron_number // block),
+                              []).append(column_values(cell))
+        columns = {name: array(typecode) for name, typecode, type_name in nuclide_columns}
+        for (atomic_number, neutron_number), values in sorted(blocks.items()):
+            if block > 1:
+                values = [(0, atomic_number * block, neutron_number * block,
+                           dominant(value[3] for value in values),
+                           dominant(value[4] for value in values),
+                           any(value[5] for value in values))]
+            for (name, typecode, type_name), value in zip(nuclide_columns, values[0]):
+                columns[name].append(value)
+        return block, columns
 
 
 class SparqlNuclideProvider(SparqlBase, NuclideProvider):
     """Load nuclide info from Wikidata Sparql endpoint."""
+
+    magic_numbers = None
+
+    @staticmethod
+    def get_item_pattern():
+        return '?item wdt:P{0}/wdt:P{1}* wd:Q{2} .'.format(
+            Nuclide.instance_pid, Nuclide.subclass_pid, Nuclide.isotope_qid)
+
+    @classmethod
+    def get_modified_since(cls, since):
+        """Return the ids of the nuclides modified after since (a timestamp)."""
+        return cls.get_modified_items(cls.get_item_pattern(), since)
+
+    @classmethod
+    def get_all_ids(cls):
+        """Return the ids of all the nuclides, including the ones not in the chart."""
+        return cls.get_items(cls.get_item_pattern())
+
     def __iter__(self):
-        nuclides = defaultdict(Nuclide)
-        nuclides_query = "SELECT ?nuclide ?atomic_number ?neutron_number ?stable ?label WHERE {{ \
+        nuclides = {}
+        values = self.get_values_clause('nuclide')
+        nuclides_query = "SELECT ?nuclide ?atomic_number ?neutron_number ?stable ?label \
+WHERE {{ {7}\
     ?nuclide wdt:P{0}/wdt:P{1}* wd:Q{2} ; \
              wdt:P{3} ?atomic_number ; \
              wdt:P{4} ?neutron_number ; \
@@ -126,22 +258,9 @@ class SparqlNuclideProvider(SparqlBase, NuclideProvider):
     BIND( EXISTS {{ ?nuclide wdt:P{0} wd:Q{6} . }} AS ?stable ) \
 }}".format(Nuclide.instance_pid, Nuclide.subclass_pid, Nuclide.isotope_qid,
             Nuclide.atomic_number_pid, Nuclide.neutron_number_pid,
-            Nuclide.isomer_qid, Nuclide.stable_qid)
-        query_result = self.get_sparql(nuclides_query)
-        for nuclide_result in query_result:
-            nuclide_uri = nuclide_result['nuclide']['value']
-            atomic_number = nuclide_result['atomic_number']['value']
-            neutron_number = nuclide_result['neutron_number']['value']
-            label = nuclide_result['label']['value']
-            nuclides[nuclide_uri].atomic_number = int(atomic_number)
-            nuclides[nuclide_uri].neutron_number = int(neutron_number)
-            nuclides[nuclide_uri].label = label
-            nuclides[nuclide_uri].half_life = None
-            nuclides[nuclide_uri].item_id = nuclide_uri.split('/')[-1]
-            if nuclide_result['stable']['value'] == 'true':
-                nuclides[nuclide_uri].classes.append('stable')
-
-        hl_query = "SELECT ?nuclide ?half_life ?unit_factor WHERE {{ \
+            Nuclide.isomer_qid, Nuclide.stable_qid, values)
+
+        hl_query = "SELECT ?nuclide ?half_life ?unit_factor WHERE {{ {5}\
     ?nuclide wdt:P{0}/wdt:P{1}* wd:Q{2} ; \
              p:P{3} ?hl_statement . \
     ?hl_statement psv:P{3} ?hl_value . \
@@ -151,56 +270,184 @@ class SparqlNuclideProvider(SparqlBase, NuclideProvider):
     ?unit_conv_statement psv:P{4} ?unit_conv_value . \
     ?unit_conv_value wikibase:quantityAmount ?unit_factor . \
 }}".format(Nuclide.instance_pid, Nuclide.subclass_pid, Nuclide.isotope_qid,
-            Nuclide.half_life_pid, Nuclide.conv_to_si_pid)
-
-        query_result = self.get_sparql(hl_query)
-        for nuclide_result in query_result:
-            nuclide_uri = nuclide_result['nuclide']['value']
-            if nuclide_result['half_life']['value'] == '0':
-                continue  # WDQS bug: values sometimes zero - skip
-            if nuclide_uri in nuclides:
-                if nuclides[nuclide_uri].half_life is None:
-                    nuclides[nuclide_uri].half_life = (
-                        float(nuclide_result['half_life']['value']) *
-                        float(nuclide_result['unit_factor']['value']))
-                # else - sparql returned more than 1 half-life value - problem?
-
-        decay_query = "SELECT ?nuclide ?decay_to ?decay_mode ?fraction WHERE {{ \
+            Nuclide.half_life_pid, Nuclide.conv_to_si_pid, values)
+
+        decay_query = "SELECT ?nuclide ?decay_to ?decay_mode ?fraction WHERE {{ {6}\
     ?nuclide wdt:P{0}/wdt:P{1}* wd:Q{2} ; \
              p:P{3} ?decay_statement . \
     ?decay_statement ps:P{3} ?decay_to ; \
                      pq:P{4} ?decay_mode ; \
                      pq:P{5} ?fraction . \
 }}".format(Nuclide.instance_pid, Nuclide.subclass_pid, Nuclide.isotope_qid,
-            Nuclide.decays_to_pid, Nuclide.decay_mode_pid, Nuclide.proportion_pid)
-        query_result = self.get_sparql(decay_query)
-        for nuclide_result in query_result:
-            nuclide_uri = nuclide_result['nuclide']['value']
-            if nuclide_uri in nuclides:
-                decay_mode_uri = nuclide_result['decay_mode']['value']
-                decay_mode = int(decay_mode_uri.split('/')[-1].replace('Q', ''))
-                nuclides[nuclide_uri].decay_modes.append(decay_mode)
+            Nuclide.decays_to_pid, Nuclide.decay_mode_pid, Nuclide.proportion_pid, values)
+
+        # the queries are independent, so run them (and the magic numbers one) all at once
+        # when streamed, the results are then read one after the other as they arrive
+        fetch = self.try_open_sparql if self.STREAM_RESULTS else self.try_get_sparql
+        calls = [partial(fetch, nuclides_query), partial(fetch, hl_query),
+                 partial(fetch, decay_query), partial(self.try_get_sparql, self.get_magic_query())]
+        results = map_concurrently(lambda call: call(), calls, len(calls))
+        query_result, hl_result, decay_result, magic_result = results
+        try:
+            if isinstance(query_result, Exception):
+                raise query_result
+            self.magic_numbers = self.parse_magic_numbers(
+                self.optional_result(magic_result, 'magic numbers'))
+
+            for nuclide_result in query_result:
+                nuclide_uri = nuclide_result['nuclide']['value']
+                values = dict(atomic_number=int(nuclide_result['atomic_number']['value']),
+                              neutron_number=int(nuclide_result['neutron_number']['value']),
+                              label=nuclide_result['label']['value'],
+                              item_id=nuclide_uri.split('/')[-1])
+                if nuclide_uri in nuclides:
+                    # the same nuclide again, its values must match
+                    for key, value in values.items():
+                        setattr(nuclides[nuclide_uri], key, value)
+                else:
+                    nuclides[nuclide_uri] = Nuclide(**values)
+                if nuclide_result['stable']['value'] == 'true':
+                    nuclides[nuclide_uri].classes.append('stable')
+
+            for nuclide_result in self.optional_result(hl_result, 'half-lives'):
+                nuclide_uri = nuclide_result['nuclide']['value']
+                if nuclide_result['half_life']['value'] == '0':
+                    continue  # WDQS bug: values sometimes zero - skip
+                if nuclide_uri in nuclides:
+                    if nuclides[nuclide_uri].half_life is None:
+                        nuclides[nuclide_uri].half_life = (
+                            float(nuclide_result['half_life']['value']) *
+                            float(nuclide_result['unit_factor']['value']))
+                    # else - sparql returned more than 1 half-life value - problem?
+
+            for nuclide_result in self.optional_result(decay_result, 'decay modes'):
+                nuclide_uri = nuclide_result['nuclide']['value']
+                if nuclide_uri in nuclides:
+                    decay_mode_uri = nuclide_result['decay_mode']['value']
+                    decay_mode = int(decay_mode_uri.split('/')[-1].replace('Q', ''))
+                    nuclides[nuclide_uri].decay_modes.append(decay_mode)
+        finally:
+            # the streamed results left unread still hold their connections
+            for result in results:
+                if isinstance(result, StreamedResult):
+                    result.close()
 
         for item_id, nuclide in nuclides.items():
             yield nuclide
 
-    def get_magic_numbers(self):
-        magic_query = "SELECT ?magic_number WHERE {{ \
+    @classmethod
+    def try_get_sparql(cls, query):
+        """Return the result of the query, or the exception raised while running it."""
+        try:
+            return cls.get_sparql(query)
+        except Exception as e:
+            return e
+
+    @classmethod
+    def try_open_sparql(cls, query):
+        """Return the streamed result of the query, or the exception raised sending it."""
+        try:
+            return cls.open_sparql(query)
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def optional_result(result, description):
+        """
+        Yield the result of an optional query, or what could be read of it if it failed.
+
+        When refreshing, the failure is raised instead, so that the previous snapshot,
+        which is complete, is kept rather than replaced by an incomplete one.
+        """
+        if isinstance(result, Exception):
+            if is_refreshing():
+                raise result
+            logger.warning('Could not load %s, the chart will be incomplete',
+                           description, exc_info=result)
+            return
+        try:
+            # streamed results may also fail while they are read
+            yield from result
+        except Exception as e:
+            if is_refreshing():
+                raise
+            logger.warning('Could not load all the %s, the chart will be incomplete',
+                           description, exc_info=e)
+
+    @staticmethod
+    def get_magic_query():
+        return "SELECT ?magic_number WHERE {{ \
     ?number wdt:P{0} wd:Q{1} ; \
             wdt:P{2} ?magic_number . \
 }} ORDER by ?magic_number".format(Nuclide.instance_pid, Nuclide.magic_qid,
                                   Nuclide.numeric_pid)
-        query_result = self.get_sparql(magic_query)
+
+    @staticmethod
+    def parse_magic_numbers(query_result):
         magic_numbers = []
         for magic_result in query_result:
             magic_number = magic_result['magic_number']['value']
             magic_numbers.append(int(magic_number))
         return magic_numbers
 
+    def get_magic_numbers(self):
+        """Return the magic numbers, already loaded along with the nuclides if possible."""
+        if self.magic_numbers is None:
+            query_result = self.try_get_sparql(self.get_magic_query())
+            self.magic_numbers = self.parse_magic_numbers(
+                self.optional_result(query_result, 'magic numbers'))
+        return self.magic_numbers
+
+
+class SnapshotNuclideProvider(SnapshotFileBase, NuclideProvider):
+    """Load nuclide info from a snapshot file, without any request to Wikidata."""
+
+    def __iter__(self):
+        for values in self.get_snapshot_data()['nuclides']:
+            nuclide = Nuclide(**dict(values, decay_modes=list(values['decay_modes'])))
+            nuclide.classes.extend(values['classes'])
+            yield nuclide
+
+    def get_magic_numbers(self):
+        return self.get_snapshot_data()['magic_numbers']
+
+
+class SharedNuclideProvider(SharedFileBase, SnapshotNuclideProvider):
+    """Load nuclide info from a shared snapshot, mapped by all the worker processes."""
+
+    def __iter__(self):
+        # the cells are views of the shared snapshot, their values are not copied
+        records = self.get_snapshot_data()['nuclides']
+        for index in range(len(records)):
+            yield NuclideView.view(records, index)
+
+    def get_table(self, records=None):
+        """
+        Like NuclideProvider.get_table(), with the views of the shared snapshot.
+
+        records are the views yielded by iterating over the provider. Only their indexes
+        in the snapshot are kept, sorted by numbers, and the cells are made when read.
+        """
+        indexes = {}
+        incomplete = []
+        snapshot_records = None
+        for nuclide in iter(self) if records is None else records:
+            snapshot_records = nuclide.records
+            if nuclide.atomic_number is not None and nuclide.neutron_number is not None:
+                # the last of the nuclides with the same numbers is shown, as in the chart
+                indexes[nuclide.atomic_number, nuclide.neutron_number] = nuclide.index
+            else:
+                incomplete.append(nuclide)
+        coordinates = sorted(indexes)
+        nuclides = ViewList(NuclideView, snapshot_records,
+                            array('L', [indexes[key] for key in coordinates]))
+        return nuclides, NuclideViewGrid(nuclides, coordinates), tuple(incomplete)
+
 
 class Nuclide:
 
     props = ('atomic_number', 'neutron_number', 'item_id', 'label', 'half_life', 'decay_modes')
+    __slots__ = props + ('classes',)
     atomic_number_pid = 1086
     neutron_number_pid = 1148
     half_life_pid = 2114
@@ -217,16 +464,18 @@ class Nuclide:
     conv_to_si_pid = 2370  # property for unit conversion to SI (seconds)
 
     def __init__(self, **kwargs):
-        self.decay_modes = []
-        for key, val in kwargs.items():
-            if key in self.props:
-                setattr(self, key, val)
-        self.classes = []
+        # a new nuclide has nothing set yet, so there is nothing to check
+        for key in self.props:
+            object.__setattr__(self, key, kwargs.get(key))
+        if self.decay_modes is None:
+            object.__setattr__(self, 'decay_modes', [])
+        object.__setattr__(self, 'classes', [])
 
     def __setattr__(self, key, value):
-        if (key in self.props and hasattr(self, key) and
-                getattr(self, key) is not None and getattr(self, key) != value):
-            raise PropertyAlreadySetException
+        if key in self.props:
+            current = getattr(self, key)
+            if current is not None and current != value:
+                raise PropertyAlreadySetException
         super(Nuclide, self).__setattr__(key, value)
 
     def __iter__(self):
@@ -236,7 +485,127 @@ class Nuclide:
 
 class NuclideCell(Nuclide, TableCell):
     """A nuclide cell."""
+    __slots__ = ()
+    __setattr__ = TableCell.__setattr__
+
+
+class NuclideView(RecordCell, NuclideCell):
+    """A nuclide cell, reading its values from a shared snapshot when accessed."""
+    __slots__ = ('records', 'index')
+    atomic_number = view_field('atomic_number')
+    neutron_number = view_field('neutron_number')
+    item_id = view_field('item_id')
+    label = view_field('label')
+    half_life = view_field('half_life')
+    decay_modes = view_field('decay_modes')
+    classes = view_field('classes')
 
 
 class NoneCell(TableCell):
     """An empty cell."""
+    __slots__ = ()
+
+
+class NuclideGrid:
+    """
+    Sparse table of nuclide cells by atomic number and neutron number.
+
+    Coordinates without a nuclide are not stored, looking them up returns an empty cell.
+    """
+
+    empty = NoneCell()
+
+    def __init__(self, cells):
+        self.cells = cells
+
+    def __getitem__(self, coordinates):
+        return self.cells.get(coordinates, self.empty)
+
+    def __contains__(self, coordinates):
+        return coordinates in self.cells
+
+    def __len__(self):
+        return len(self.cells)
+
+    @cached_property
+    def max_atomic_number(self):
+        return max((anum for anum, nnum in self.cells), default=-1)
+
+    @cached_property
+    def max_neutron_number(self):
+        return max((nnum for anum, nnum in self.cells), default=-1)
+
+    @cached_property
+    def rows(self):
+        """Sorted neutron numbers and the matching cells, by atomic number."""
+        rows = {}
+        for anum, nnum in sorted(self.cells):
+            neutron_numbers, cells = rows.setdefault(anum, ([], []))
+            neutron_numbers.append(nnum)
+            cells.append(self.cells[anum, nnum])
+        return rows
+
+    def band(self, min_atomic_number, max_atomic_number,
+             min_neutron_number=0, max_neutron_number=None):
+        """Yield the cells within the given (inclusive) ranges, row by row."""
+        rows = self.rows
+        for anum in range(min_atomic_number, max_atomic_number + 1):
+            if anum not in rows:
+                continue
+            neutron_numbers, cells = rows[anum]
+            start = bisect.bisect_left(neutron_numbers, min_neutron_number)
+            if max_neutron_number is None:
+                stop = len(neutron_numbers)
+            else:
+                stop = bisect.bisect_right(neutron_numbers, max_neutron_number)
+            yield from cells[start:stop]
+
+
+class NuclideViewGrid(NuclideGrid):
+    """
+    Sparse table of the nuclides of a shared snapshot, by atomic number and neutron number.
+
+    The coordinates are packed as atomic_number << 16 | neutron_number, sorted like the
+    cells of nuclides (a ViewList), so the cells are looked up by bisection.
+    """
+
+    def __init__(self, nuclides, coordinates):
+        self.nuclides = nuclides
+        self.keys = array('L', [anum << 16 | nnum for anum, nnum in coordinates])
+
+    def find(self, atomic_number, neutron_number):
+        """Return the position of the cell in nuclides, or None if there is none."""
+        key = atomic_number << 16 | neutron_number
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def __getitem__(self, coordinates):
+        position = self.find(*coordinates)
+        return self.empty if position is None else self.nuclides[position]
+
+    def __contains__(self, coordinates):
+        return self.find(*coordinates) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @cached_property
+    def max_atomic_number(self):
+        return self.keys[-1] >> 16 if self.keys else -1
+
+    @cached_property
+    def max_neutron_number(self):
+        return max((key & 0xffff for key in self.keys), default=-1)
+
+    def band(self, min_atomic_number, max_atomic_number,
+             min_neutron_number=0, max_neutron_number=None):
+        """Yield the cells within the given (inclusive) ranges, row by row."""
+        for anum in range(min_atomic_number, max_atomic_number + 1):
+            start = bisect.bisect_left(self.keys, anum << 16 | min_neutron_number)
+            if max_neutron_number is None:
+                stop = bisect.bisect_left(self.keys, anum + 1 << 16)
+            else:
+                stop = bisect.bisect_right(self.keys, anum << 16 | max_neutron_number)
+            yield from self.nuclides[start:stop]
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+
+import snapshot
+
+MAGIC = b'PTABLE\x00\x01'
+
+# array typecodes of the numeric fields, the other fields are strings
+field_types = {'number': 'i', 'period': 'i', 'group': 'i', 'special': 'i',
+               'atomic_number': 'i', 'neutron_number': 'i', 'half_life': 'd',
+               'decay_modes': 'ints', 'classes': 'strings'}
+
+# stored in place of None in the integer fields
+NONE_INT = -2 ** 31
+
+
+class StringColumn(Sequence):
+    """Strings stored as UTF-8 bytes, decoded one at a time when read."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+
+class RecordView(Sequence):
+    """Records stored as columns, read as dictionaries like the records of snapshot files."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, index):
+        return {field: self.read(field, column[index]) for field, column in self.columns.items()}
+
+    def get(self, index, field):
+        """Return a field of a record, with tuples instead of lists as in the table cells."""
+        value = self.read(field, self.columns[field][index])
+        return tuple(value) if isinstance(value, list) else value
+
+    @staticmethod
+    def read(field, value):
+        field_type = field_types.get(field)
+        if field_type == 'i':
+            return None if value == NONE_INT else value
+        if field_type == 'd':
+            return None if math.isnan(value) else value
+        if field_type == 'ints':
+            return [int(item) for item in value.split()]
+        if field_type == 'strings':
+            return value.split()
+        return value or None
+
+
+def view_field(name):
+    """Return a property reading a field of a RecordCell from its records."""
+    return property(lambda cell: cell.records.get(cell.index, name))
+
+
+class RecordCell:
+    """
+    Mixin of the table cells which are views of a record of a RecordView.
+
+    The subclasses have records and index slots, and their fields are properties
+    made by view_field(), so the values are only read from the mapping when accessed.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def view(cls, records, index):
+        cell = object.__new__(cls)
+        object.__setattr__(cell, 'records', records)
+        object.__setattr__(cell, 'index', index)
+        return cell
+
+
+class ViewList(Sequence):
+    """RecordCell views of some records of a RecordView, made when read."""
+
+    def __init__(self, cell_class, records, indexes):
+        self.cell_class = cell_class
+        self.records = records
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return ViewList(self.cell_class, self.records, self.indexes[position])
+        return self.cell_class.view(self.records, self.indexes[position])
+
+    def __iter__(self):
+        for index in self.indexes:
+            yield self.cell_class.view(self.records, index)
+
+
+class LabelTable(Mapping):
+    """Labels by item id, looked up in the sorted ids without loading them."""
+
+    def __init__(self, ids, labels):
+        self.ids = ids
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __getitem__(self, item_id):
+        index = bisect.bisect_left(self.ids, item_id)
+        if index == len(self.ids) or self.ids[index] != item_id:
+            raise KeyError(item_id)
+        return self.labels[index]
+
+
+class SharedSnapshot:
+    """
+    Data of a snapshot file, mapped read-only in memory.
+
+    The pages of the mapping are shared by all the processes mapping the same file,
+    and the values are only decoded when they are read.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mapping)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise snapshot.InvalidSnapshotFileException('{0} is not a shared snapshot'.format(path))
+        length, = struct.unpack_from('<I', view, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(view[start:start + length]))
+        layout = (self.header.get('format'), self.header.get('byteorder'))
+        if layout != (snapshot.FILE_FORMAT, sys.byteorder):
+            raise snapshot.InvalidSnapshotFileException(
+                '{0} was written for another version or byte order'.format(path))
+        self.view = view
+
+    def section(self, name):
+        typecode, offset, length = self.header['sections'][name]
+        return self.view[offset:offset + length].cast(typecode)
+
+    def strings(self, name):
+        return StringColumn(self.section(name + '.offsets'), self.section(name + '.data'))
+
+    def records(self, name):
+        columns = {}
+        for field in self.header['tables'][name]:
+            key = '{0}.{1}'.format(name, field)
+            if field_types.get(field) in ('i', 'd'):
+                columns[field] = self.section(key)
+            else:
+                columns[field] = self.strings(key)
+        return RecordView(columns)
+
+    @property
+    def data(self):
+        """The data, in the same layout as the one of snapshot files."""
+        return {'elements': self.records('elements'),
+                'nuclides': self.records('nuclides'),
+                'labels': {language: LabelTable(self.strings('labels.{0}.ids'.format(language)),
+                                                self.strings('labels.{0}.labels'.format(language)))
+                           for language in self.header['languages']},
+                'languages': self.header['available_languages'],
+                'magic_numbers': self.header['magic_numbers']}
+
+
+def write(path, data):
+    """
+    Write the data of a snapshot file as a shared snapshot, replacing it atomically.
+
+    The numbers are stored in the native byte order, the strings as UTF-8 with their
+    offsets, and empty strings are read as None. Processes which mapped the previous
+    file keep reading it until they map the new one.
+    """
+    sections = {}
+
+    def add_strings(name, values):
+        encoded = [(value or '').encode('utf-8') for value in values]
+        offsets = array('I', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        sections[name + '.offsets'] = offsets
+        sections[name + '.data'] = array('B', b''.join(encoded))
+
+    def add_records(name, records):
+        fields = list(records[0]) if records else []
+        for field in fields:
+            values = [record[field] for record in records]
+            field_type = field_types.get(field)
+            key = '{0}.{1}'.format(name, field)
+            if field_type == 'i':
+                sections[key] = array('i', [NONE_INT if value is None else value
+                                            for value in values])
+            elif field_type == 'd':
+                sections[key] = array('d', [math.nan if value is None else value
+                                            for value in values])
+            elif field_type in ('ints', 'strings'):
+                add_strings(key, [' '.join(map(str, value)) for value in values])
+            else:
+                add_strings(key, values)
+        return fields
+
+    tables = {'elements': add_records('elements', data['elements']),
+              'nuclides': add_records('nuclides', data['nuclides'])}
+    for language, labels in data['labels'].items():
+        ids = sorted(labels)
+        add_strings('labels.{0}.ids'.format(language), ids)
+        add_strings('labels.{0}.labels'.format(language), [labels[item_id] for item_id in ids])
+
+    header = {'format': snapshot.FILE_FORMAT, 'byteorder': sys.byteorder,
+              'created': time.time(), 'tables': tables,
+              'languages': sorted(data['labels']), 'available_languages': data['languages'],
+              'magic_numbers': data['magic_numbers'], 'sections': {}}
+    # the offsets depend on the length of the header, which includes them
+    start = 0
+    while True:
+        offset = start
+        for name, section in sections.items():
+            offset += -offset % 8
+            header['sections'][name] = [section.typecode, offset,
+                                        len(section) * section.itemsize]
+            offset += len(section) * section.itemsize
+        encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        length = len(MAGIC) + 4 + len(encoded)
+        if length <= start:
+            break
+        start = length + -length % 8
+    temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(encoded)) + encoded)
+        for name, section in sections.items():
+            f.write(b'\0' * (header['sections'][name][1] - f.tell()))
+            f.write(section.tobytes())
+    os.replace(temp_path, path)
+    return header
+
+
+_mapped = {}
+_mapped_lock = threading.Lock()
+
+
+def load(path):
+    """Return the data of the shared snapshot at path, mapping it again once replaced."""
+    key = snapshot.file_version(path)
+    with _mapped_lock:
+        if path in _mapped and _mapped[path][0] == key:
+            return _mapped[path][1]
+    data = SharedSnapshot(path).data
+    with _mapped_lock:
+        _mapped[path] = (key, data)
+    return data
+
+
+class SharedFileBase(snapshot.SnapshotFileBase):
+    """Load items from a shared snapshot written by build_snapshot.py --shared."""
+
+    SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot.shm')
+
+    @classmethod
+    def get_snapshot_data(cls):
+        return load(cls.SNAPSHOT_PATH)
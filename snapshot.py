@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from cachetools import LRUCache
+
+import base
+
+logger = logging.getLogger(__name__)
+
+# version of the layout of snapshot files, files in any other version are not loaded
+FILE_FORMAT = 1
+
+
+def fingerprint(records):
+    """Return a short digest identifying the content of records."""
+    digest = hashlib.sha1()
+    for record in records:
+        digest.update(repr(record).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class InvalidSnapshotFileException(Exception):
+    """The snapshot file is corrupted or in an unsupported format."""
+
+
+def write_file(path, data):
+    """
+    Write data to a snapshot file, replacing the previous one atomically.
+
+    The file is gzipped, and starts with a JSON header line with the format, the
+    version and the checksum of the JSON data following it.
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(payload).hexdigest()
+    header = {'format': FILE_FORMAT, 'created': time.time(), 'version': digest[:16],
+              'checksum': 'sha256:' + digest}
+    temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with gzip.open(temp_path, 'wb') as f:
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        f.write(payload)
+    os.replace(temp_path, path)
+    return header
+
+
+def read_file(path):
+    """Return the header and the data of a snapshot file, checking its integrity."""
+    with gzip.open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        payload = f.read()
+    if header.get('format') != FILE_FORMAT:
+        raise InvalidSnapshotFileException(
+            '{0} has format {1}, expected {2}'.format(path, header.get('format'), FILE_FORMAT))
+    if header.get('checksum') != 'sha256:' + hashlib.sha256(payload).hexdigest():
+        raise InvalidSnapshotFileException('{0} does not match its checksum'.format(path))
+    return header, json.loads(payload)
+
+
+def file_version(path):
+    """Return what identifies the content of a file, changed when it is replaced."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def load_file(path):
+    """Return the data of a snapshot file, reading it again only after it changed."""
+    version = file_version(path)
+    with _files_lock:
+        if path in _files and _files[path][0] == version:
+            return _files[path][1]
+    header, data = read_file(path)
+    logger.info('Loaded snapshot %s built at %s', header['version'],
+                time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(header['created'])))
+    with _files_lock:
+        _files[path] = (version, data)
+    return data
+
+
+class SnapshotFileBase:
+    """Load items from a snapshot file written by build_snapshot.py."""
+
+    SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot.json.gz')
+
+    @classmethod
+    def get_snapshot_data(cls):
+        return load_file(cls.SNAPSHOT_PATH)
+
+    @classmethod
+    def get_file_versions(cls):
+        return {cls.SNAPSHOT_PATH: file_version(cls.SNAPSHOT_PATH)}
+
+
+class Snapshot:
+    """
+    Complete data built from Wikidata at a given time.
+
+    files are the versions of the files the data was loaded from, if any, by path.
+    They must be read before loading the data, so a file replaced meanwhile is noticed.
+    """
+
+    def __init__(self, data, records=(), memo_size=256, files=None):
+        self.data = data
+        self.version = fingerprint(records)
+        self.created = time.time()
+        self.files = files or {}
+        self.memo = LRUCache(maxsize=memo_size)
+        self.memo_lock = threading.Lock()
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+    def is_outdated(self):
+        """Whether any of the files the data was loaded from has been replaced since."""
+        return any(file_version(path) != version for path, version in self.files.items())
+
+    def memoize(self, key, func):
+        """
+        Return func(), computed once for this snapshot.
+
+        The result is dropped along with the snapshot, so it never outlives the data.
+        """
+        with self.memo_lock:
+            if key in self.memo:
+                return self.memo[key]
+        value = func()
+        with self.memo_lock:
+            self.memo[key] = value
+        return value
+
+    def memoize_stream(self, key, generate, join):
+        """
+        Yield the chunks of generate(), or the whole value if already computed.
+
+        Once all the chunks have been consumed, they are joined with join() and kept
+        for this snapshot, so the value is only generated again if the stream is aborted.
+        """
+        with self.memo_lock:
+            if key in self.memo:
+                yield self.memo[key]
+                return
+        chunks = []
+        for chunk in generate():
+            chunks.append(chunk)
+            yield chunk
+        value = join(chunks)
+        with self.memo_lock:
+            self.memo[key] = value
+
+
+class SnapshotStore:
+    """
+    Keep the latest snapshot for each key and rebuild it in the background.
+
+    Readers always get the latest complete snapshot, even if it is older than max_age
+    or its files have been replaced, while the new one is being built. Only the very
+    first read of a key has to wait.
+    If maxsize is set, the least recently read snapshots are dropped beyond that size.
+    """
+
+    def __init__(self, max_age=21600, refresh_ahead=1800, interval=60, maxsize=None):
+        self.max_age = max_age
+        self.refresh_ahead = refresh_ahead
+        self.interval = interval
+        self.maxsize = maxsize
+        self.snapshots = {}
+        self.builders = {}
+        self.last_read = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.build_locks = {}
+        self.pid = None
+
+    def get(self, key, builder):
+        """Return the latest snapshot for key, building it with builder() if needed."""
+        self.start()
+        self.last_read[key] = time.time()
+        snapshot = self.snapshots.get(key)
+        if snapshot is None:
+            with self.lock:
+                build_lock = self.build_locks.setdefault(key, threading.Lock())
+            with build_lock:
+                snapshot = self.snapshots.get(key)
+                if snapshot is None:
+                    snapshot = self.build(key, builder)
+        elif snapshot.age > self.max_age or snapshot.is_outdated():
+            self.refresh_async(key)
+        return snapshot
+
+    def build(self, key, builder):
+        snapshot = builder()
+        with self.lock:
+            self.builders[key] = builder
+            self.snapshots[key] = snapshot
+            if self.maxsize is not None and len(self.snapshots) > self.maxsize:
+                self.drop(min(self.snapshots, key=lambda key: self.last_read.get(key, 0)))
+        return snapshot
+
+    def drop(self, key):
+        self.snapshots.pop(key, None)
+        self.builders.pop(key, None)
+        self.last_read.pop(key, None)
+        self.build_locks.pop(key, None)
+
+    def refresh(self, key):
+        """Rebuild the snapshot for key, keeping the old one if that fails."""
+        try:
+            builder = self.builders.get(key)
+            previous = self.snapshots.get(key)
+            if builder is not None:
+                # what other processes fetched since the previous snapshot is reused
+                with base.refreshing(previous.created if previous is not None else None):
+                    self.build(key, builder)
+        except Exception:
+            logger.exception('Could not refresh snapshot %r', key)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def refresh_async(self, key):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        threading.Thread(target=self.refresh, args=(key,), daemon=True).start()
+
+    def start(self):
+        """Start the refresh scheduler in the current process if not running yet."""
+        # threads do not survive fork(), so every worker needs its own scheduler
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.time()
+            for key, snapshot in list(self.snapshots.items()):
+                if now - self.last_read.get(key, 0) > self.max_age:
+                    # nobody asked for it lately, do not keep it up to date forever
+                    with self.lock:
+                        self.drop(key)
+                elif snapshot.age > self.max_age - self.refresh_ahead:
+                    self.refresh_async(key)
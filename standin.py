@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import calendar
+import csv
+import hashlib
+import io
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from urllib.request import Request, urlopen
+
+import data
+import snapshot
+from base import USER_AGENT, BaseProvider, SparqlBase
+
+logger = logging.getLogger(__name__)
+
+ENTITY_URI = 'http://www.wikidata.org/entity/'
+
+# paths served by the stand-in, and the Wikidata URLs they stand for
+upstreams = {
+    urlsplit(BaseProvider.WD_API).path: BaseProvider.WD_API,
+    urlsplit(SparqlBase.SPARQL_API).path: SparqlBase.SPARQL_API,
+}
+
+
+def request_key(path, params, accept):
+    """Return the fixture key of a request, whatever the order of its parameters."""
+    if 'text/csv' not in accept:
+        accept = 'application/json'
+    return hashlib.sha1(json.dumps([path, sorted(params), accept]).encode('utf-8')).hexdigest()
+
+
+def uri(value):
+    return {'type': 'uri', 'value': ENTITY_URI + value}
+
+
+def literal(value):
+    return {'type': 'literal', 'value': str(value)}
+
+
+def element_position(number):
+    """Return the period, group and special series of an element, by atomic number."""
+    ends = [2, 10, 18, 36, 54, 86, 118]
+    period = next(index for index, end in enumerate(ends) if number <= end) + 1
+    offset = number - (ends[period - 2] if period > 1 else 0)
+    if period == 1:
+        return period, 1 if offset == 1 else 18, None
+    if offset <= 2:
+        return period, offset, None
+    if period <= 3:
+        return period, offset + 10, None
+    if period <= 5:
+        return period, offset, None
+    if offset <= 17:
+        return period, None, period
+    return period, offset - 14, None
+
+
+def modified_after(query):
+    """Return the timestamp after which the query looks for modified items."""
+    match = re.search(r'\?modified > "([^"]+)"', query)
+    return calendar.timegm(time.strptime(match.group(1), '%Y-%m-%dT%H:%M:%SZ'))
+
+
+def values_clause(query):
+    """Return the ids of the items the query is restricted to by VALUES, or None."""
+    match = re.search(r'VALUES \?\w+ \{([^}]*)\}', query)
+    if match is None:
+        return None
+    return {value.replace('wd:', '') for value in match.group(1).split()}
+
+
+class SyntheticWikidata:
+    """
+    Answer the queries of the providers with generated data shaped like Wikidata's.
+
+    The data is complete and deterministic for a given seed, with about as many
+    elements and nuclides as Wikidata has, so it can stand in for recorded fixtures.
+    Items passed to touch() are reported as modified, and the queries matching any
+    of the failing patterns fail like the ones timing out on the query service.
+    """
+
+    magic_numbers = [2, 8, 20, 28, 50, 82, 126]
+
+    def __init__(self, seed=0):
+        self.modified = {}
+        self.failing = set()
+        rng = random.Random(seed)
+        self.elements = []
+        for number in range(1, 119):
+            period, group, special = element_position(number)
+            superclasses = [data.periods[period - 1]]
+            if group:
+                superclasses.append(data.groups[group - 1])
+            if special:
+                superclasses.append(data.special_series[special - data.special_start])
+            if group == 1 and number > 1:
+                superclasses.append(19557)  # alkali metal
+            self.elements.append(('Q%d' % (1000000 + number), 'E%d' % number, number,
+                                  superclasses))
+        self.nuclides = []
+        for atomic_number in range(1, 119):
+            center = round(atomic_number * (1 + 0.006 * atomic_number))
+            width = 6 + atomic_number // 8
+            for neutron_number in range(max(center - width, 0), center + width + 1):
+                distance = neutron_number - center
+                stable = atomic_number < 83 and (
+                    distance == 0 or (distance == 1 and atomic_number % 3 == 0))
+                if stable:
+                    half_life = None
+                else:
+                    half_life = 10 ** (9 - 1.8 * abs(distance) + rng.uniform(-2, 2))
+                if atomic_number > 82 and distance <= 0:
+                    decay_modes = [179856]  # alpha decay
+                elif distance > 0:
+                    decay_modes = [14646001]  # beta minus
+                else:
+                    decay_modes = [1357356, 109910]  # positron emission, electron capture
+                self.nuclides.append(('Q%d' % (2000000 + atomic_number * 1000 + neutron_number),
+                                      atomic_number, neutron_number, stable, half_life,
+                                      [] if stable else decay_modes))
+
+    def touch(self, ids, when=None):
+        """Mark the items as modified at when (a timestamp, by default now)."""
+        when = time.time() if when is None else when
+        for item_id in ids:
+            self.modified[item_id] = when
+
+    def respond(self, path, params):
+        """Return the JSON result of a request, or None if it is not understood."""
+        params = dict(params)
+        if path == urlsplit(SparqlBase.SPARQL_API).path:
+            return self.query(params.get('query', ''))
+        if path == urlsplit(BaseProvider.WD_API).path:
+            if params.get('meta') == 'siteinfo':
+                return {'query': {'languages': [{'code': code} for code in data.languages]}}
+            if params.get('action') == 'wbgetentities' and params.get('props') == 'labels':
+                return self.labels(params['ids'].split('|'), params.get('languages', 'en'))
+        return None
+
+    def is_failing(self, query):
+        return any(pattern in query for pattern in self.failing)
+
+    def query(self, query):
+        ids = values_clause(query)
+        elements = [element for element in self.elements if ids is None or element[0] in ids]
+        nuclides = [nuclide for nuclide in self.nuclides if ids is None or nuclide[0] in ids]
+        if 'schema:dateModified' in query:
+            since = modified_after(query)
+            items = elements if 'wd:Q11344' in query else nuclides
+            return self.bindings(['item'], [
+                {'item': uri(item[0])} for item in items
+                if self.modified.get(item[0], 0) > since])
+        if query.startswith('SELECT ?item WHERE'):
+            items = elements if 'wd:Q11344' in query else nuclides
+            return self.bindings(['item'], [{'item': uri(item[0])} for item in items])
+        if '?subclasses_of' in query:
+            return self.bindings(['item', 'symbol', 'number', 'subclasses_of'], [
+                {'item': uri(item_id), 'symbol': literal(symbol), 'number': literal(number),
+                 'subclasses_of': literal(' '.join(ENTITY_URI + 'Q%d' % superclass
+                                                   for superclass in superclasses))}
+                for item_id, symbol, number, superclasses in elements])
+        if '?stable' in query:
+            return self.bindings(['nuclide', 'atomic_number', 'neutron_number', 'stable',
+                                  'label'], [
+                {'nuclide': uri(nuclide[0]), 'atomic_number': literal(nuclide[1]),
+                 'neutron_number': literal(nuclide[2]),
+                 'stable': literal('true' if nuclide[3] else 'false'),
+                 'label': literal('E%d-%d' % (nuclide[1], nuclide[1] + nuclide[2]))}
+                for nuclide in nuclides])
+        if '?half_life' in query:
+            # the half-lives are given in years when long, as many are on Wikidata
+            return self.bindings(['nuclide', 'half_life', 'unit_factor'], [
+                {'nuclide': uri(nuclide[0]),
+                 'half_life': literal(repr(nuclide[4] / 31556952 if nuclide[4] > 1e7
+                                           else nuclide[4])),
+                 'unit_factor': literal(31556952 if nuclide[4] > 1e7 else 1)}
+                for nuclide in nuclides if nuclide[4] is not None])
+        if '?decay_mode' in query:
+            return self.bindings(['nuclide', 'decay_to', 'decay_mode', 'fraction'], [
+                {'nuclide': uri(nuclide[0]), 'decay_to': uri(nuclide[0]),
+                 'decay_mode': uri('Q%d' % decay_mode),
+                 'fraction': literal(1 / len(nuclide[5]))}
+                for nuclide in nuclides for decay_mode in nuclide[5]])
+        if '?magic_number' in query:
+            return self.bindings(['magic_number'], [{'magic_number': literal(number)}
+                                                    for number in self.magic_numbers])
+        return None
+
+    @staticmethod
+    def bindings(names, rows):
+        return {'head': {'vars': names}, 'results': {'bindings': rows}}
+
+    def labels(self, ids, language):
+        numbers = {item_id: number for item_id, symbol, number, superclasses in self.elements}
+        entities = {}
+        for item_id in ids:
+            if item_id in numbers:
+                entities[item_id] = {'id': item_id, 'labels': {language: {
+                    'language': language,
+                    'value': 'element {0} ({1})'.format(numbers[item_id], language)}}}
+            else:
+                entities[item_id] = {'id': item_id, 'missing': ''}
+        return {'entities': entities}
+
+
+def to_csv(result):
+    """Return a SPARQL JSON result in the CSV format of the query service."""
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\r\n')
+    names = result['head']['vars']
+    writer.writerow(names)
+    for row in result['results']['bindings']:
+        writer.writerow([row[name]['value'] if name in row else '' for name in names])
+    return output.getvalue()
+
+
+class StandIn:
+    """
+    Local HTTP server standing in for the Wikidata API and query service.
+
+    Responses are replayed from the fixtures, recorded from Wikidata if record is set,
+    or generated by synthetic (a SyntheticWikidata) if neither has them.
+    """
+
+    def __init__(self, fixtures=None, record=False, synthetic=None):
+        self.fixtures = {} if fixtures is None else fixtures
+        self.record = record
+        self.synthetic = synthetic
+        self.requests = 0
+        self.misses = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.make_handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(*self.server.server_address)
+
+    def make_handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive, like Wikidata, so the connection pool is exercised too
+            protocol_version = 'HTTP/1.1'
+            # the headers and the body are written separately, do not wait between them
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.respond(b'')
+
+            def do_POST(self):
+                self.respond(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+            def respond(self, body):
+                parts = urlsplit(self.path)
+                params = parse_qsl(parts.query) + parse_qsl(body.decode('utf-8'))
+                status, content_type, content = standin.handle(
+                    self.command, parts.path, parts.query, params,
+                    self.headers.get('Accept', ''), body)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
+
+    def handle(self, method, path, query, params, accept, body):
+        """Return the status, the content type and the content of the response."""
+        key = request_key(path, params, accept)
+        with self.lock:
+            self.requests += 1
+            fixture = self.fixtures.get(key)
+        if fixture is None and self.record and path in upstreams:
+            fixture = self.fetch(method, path, query, accept, body)
+            with self.lock:
+                self.fixtures[key] = fixture
+        if fixture is None and self.synthetic is not None:
+            if self.synthetic.is_failing(dict(params).get('query', '')):
+                return 500, 'text/plain', b'java.util.concurrent.TimeoutException'
+            result = self.synthetic.respond(path, params)
+            if result is not None:
+                if 'text/csv' in accept:
+                    return 200, 'text/csv', to_csv(result).encode('utf-8')
+                return 200, 'application/json', json.dumps(result).encode('utf-8')
+        if fixture is None:
+            logger.warning('No fixture for %s %s', method, path)
+            with self.lock:
+                self.misses.append((path, params))
+            return 404, 'text/plain', b'No fixture for this request'
+        return fixture['status'], fixture['content_type'], fixture['body'].encode('utf-8')
+
+    @staticmethod
+    def fetch(method, path, query, accept, body):
+        """Return the response of Wikidata to the request, as a fixture."""
+        url = upstreams[path] + ('?' + query if query else '')
+        request = Request(url, data=body if method == 'POST' else None, method=method,
+                          headers={'User-Agent': USER_AGENT, 'Accept': accept or '*/*'})
+        if method == 'POST':
+            request.add_header('Content-Type', 'application/x-www-form-urlencoded')
+        with urlopen(request) as response:
+            return {'status': response.status,
+                    'content_type': response.headers.get('Content-Type', 'application/json'),
+                    'body': response.read().decode('utf-8')}
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def load_fixtures(path):
+    """Return the fixtures recorded in a file written by save_fixtures()."""
+    header, fixtures = snapshot.read_file(path)
+    return fixtures
+
+
+def save_fixtures(path, fixtures):
+    """Write the recorded fixtures, in the same format as the snapshot files."""
+    return snapshot.write_file(path, fixtures)
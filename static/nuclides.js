@@ -1,8 +1,281 @@
+var SVG_NS = 'http://www.w3.org/2000/svg',
+	XLINK_NS = 'http://www.w3.org/1999/xlink',
+	COLUMN_TYPES = {
+		uint32: Uint32Array,
+		uint16: Uint16Array,
+		int8: Int8Array,
+		uint8: Uint8Array
+	};
+
+function svgElement( name, attributes ) {
+	var element = document.createElementNS( SVG_NS, name );
+	$.each( attributes, function ( key, value ) {
+		element.setAttribute( key, value );
+	} );
+	return element;
+}
+
+/**
+ * Read the chart data packed by /api/nuclides?format=binary.
+ */
+function parseNuclides( buffer ) {
+	var headerLength = new DataView( buffer ).getUint32( 0, true ),
+		header = JSON.parse( new TextDecoder().decode( new Uint8Array( buffer, 4, headerLength ) ) ),
+		columns = {};
+	$.each( header.columns, function ( i, column ) {
+		columns[ column.name ] = new COLUMN_TYPES[ column.type ](
+			buffer, 4 + headerLength + column.offset, header.count );
+	} );
+	header.columns = columns;
+	return header;
+}
+
+function renderIncomplete( container, incomplete ) {
+	var $tbody = $( '<tbody>' );
+	if ( !incomplete.length ) {
+		return;
+	}
+	$.each( incomplete, function ( i, nuclide ) {
+		$( '<tr>' ).append(
+			$( '<td>' ).append( $( '<a>' )
+				.attr( 'href', '//www.wikidata.org/wiki/' + nuclide.item_id )
+				.text( nuclide.label + ' (' + nuclide.item_id + ')' ) ),
+			$( '<td>' ).text( nuclide.atomic_number || '?' ),
+			$( '<td>' ).text( nuclide.neutron_number || '?' )
+		).appendTo( $tbody );
+	} );
+	$( container ).append(
+		$( '<h2>' ).text( 'Incomplete' ),
+		$( '<table>' ).append(
+			$( '<thead>' ).append( $( '<tr>' ).append(
+				$( '<th>' ).text( 'nuclide' ),
+				$( '<th>' ).text( 'atomic number' ),
+				$( '<th>' ).text( 'neutron number' ) ) ),
+			$tbody )
+	);
+}
+
+function loadNuclides( url, callback ) {
+	var request = new XMLHttpRequest();
+	request.open( 'GET', url );
+	request.responseType = 'arraybuffer';
+	request.onload = function () {
+		if ( request.status === 200 ) {
+			callback( parseNuclides( request.response ) );
+		}
+	};
+	request.send();
+}
+
+/**
+ * Draw the axes of the chart, with the magic numbers.
+ */
+function renderAxes( svg, data ) {
+	var maxProtons = data.max_atomic_number,
+		maxNeutrons = data.max_neutron_number,
+		fragment = document.createDocumentFragment();
+
+	svg.setAttribute( 'viewBox', [ -10, -( maxProtons + 10 ), maxNeutrons + 20, maxProtons + 20 ].join( ' ' ) );
+	$.each( data.magic_numbers, function ( i, magicNumber ) {
+		var text;
+		if ( magicNumber < maxNeutrons ) {
+			fragment.appendChild( svgElement( 'line', {
+				x1: magicNumber + 0.5, y1: -maxProtons, x2: magicNumber + 0.5, y2: 0
+			} ) );
+			text = svgElement( 'text', {
+				transform: 'translate(' + magicNumber + ', ' +
+					-( 2 * Math.pow( magicNumber, 0.8 ) + 10 ) + ')rotate(-90)'
+			} );
+			text.textContent = magicNumber + ' neutrons';
+			fragment.appendChild( text );
+		}
+		if ( magicNumber < maxProtons ) {
+			fragment.appendChild( svgElement( 'line', {
+				x1: 0, y1: -( magicNumber - 0.5 ), x2: maxNeutrons, y2: -( magicNumber - 0.5 )
+			} ) );
+			text = svgElement( 'text', { x: magicNumber * 1.5 + 25, y: -magicNumber } );
+			text.textContent = magicNumber + ' protons';
+			fragment.appendChild( text );
+		}
+	} );
+	svg.appendChild( fragment );
+}
+
+/**
+ * Draw the nuclides, or the blocks of nuclides of a tile, into the container.
+ */
+function renderCells( container, data, view ) {
+	var i, id, classes, viewClass, link, rect, title, protons, neutrons,
+		block = data.block || 1,
+		columns = data.columns,
+		viewColumn = view === 'nuclide_decays' ?
+			[ columns.decay_mode, data.decay_mode_classes ] :
+			[ columns.half_life, data.half_life_classes ],
+		fragment = document.createDocumentFragment();
+
+	for ( i = 0; i < data.count; i++ ) {
+		classes = 'nuclide';
+		if ( columns.stable[ i ] ) {
+			classes += ' stable';
+		}
+		viewClass = viewColumn[ 0 ][ i ];
+		if ( viewClass >= 0 ) {
+			classes += ' ' + viewColumn[ 1 ][ viewClass ];
+		}
+		protons = columns.atomic_number[ i ];
+		neutrons = columns.neutron_number[ i ];
+		rect = svgElement( 'rect', {
+			x: neutrons,
+			y: -( protons + block - 1 ),
+			width: block,
+			height: block,
+			'class': classes
+		} );
+		title = document.createElementNS( SVG_NS, 'title' );
+		rect.appendChild( title );
+		if ( columns.item_id[ i ] ) {
+			id = 'Q' + columns.item_id[ i ];
+			title.textContent = id;
+			link = document.createElementNS( SVG_NS, 'a' );
+			link.setAttributeNS( XLINK_NS, 'xlink:href', '//www.wikidata.org/wiki/' + id );
+			link.appendChild( rect );
+			fragment.appendChild( link );
+		} else {
+			// a block of nuclides, zoom in to see them
+			title.textContent = protons + '-' + ( protons + block - 1 ) + ' protons, ' +
+				neutrons + '-' + ( neutrons + block - 1 ) + ' neutrons';
+			fragment.appendChild( rect );
+		}
+	}
+	container.appendChild( fragment );
+}
+
+/**
+ * Draw the chart like the server-side nuclide_chart.html template does.
+ */
+function renderChart( svg, data ) {
+	renderAxes( svg, data );
+	renderCells( svg, data, svg.getAttribute( 'data-view' ) );
+}
+
+/**
+ * Return the range of neutron and atomic numbers of the chart visible in the window.
+ */
+function visibleRange( svg ) {
+	var matrix = svg.getScreenCTM().inverse(),
+		topLeft = svg.createSVGPoint(),
+		bottomRight = svg.createSVGPoint();
+
+	topLeft.x = 0;
+	topLeft.y = 0;
+	bottomRight.x = window.innerWidth;
+	bottomRight.y = window.innerHeight;
+	topLeft = topLeft.matrixTransform( matrix );
+	bottomRight = bottomRight.matrixTransform( matrix );
+	// the atomic numbers go up, while the SVG coordinates go down
+	return {
+		minNeutrons: topLeft.x,
+		maxNeutrons: bottomRight.x,
+		minProtons: -bottomRight.y,
+		maxProtons: -topLeft.y
+	};
+}
+
+/**
+ * Draw the chart from tiles, only loading the tiles in view at the level of detail
+ * matching the zoom. Each zoom level has its own layer, and only the current one is shown.
+ */
+function TiledChart( svg, url ) {
+	this.svg = svg;
+	this.url = url;
+	this.view = svg.getAttribute( 'data-view' );
+	this.layers = [];
+	this.loaded = {};
+}
+
+TiledChart.prototype.start = function () {
+	var chart = this;
+	// the first tile covers the whole chart, at the lowest level of detail
+	loadNuclides( this.url + '/0/0/0', function ( data ) {
+		var zoom;
+		chart.header = data;
+		renderAxes( chart.svg, data );
+		for ( zoom = 0; zoom < data.zoom_levels; zoom++ ) {
+			chart.layers.push( chart.svg.appendChild( svgElement( 'g', {} ) ) );
+		}
+		chart.loaded[ '0/0/0' ] = true;
+		renderCells( chart.layers[ 0 ], data, chart.view );
+		chart.update( 1 );
+	} );
+};
+
+TiledChart.prototype.update = function ( scale ) {
+	var x, y, key, span, range, minX, maxX, minY, maxY,
+		chart = this,
+		header = this.header,
+		zoom = Math.floor( Math.log( scale ) / Math.LN2 ) + 2;
+
+	if ( !header ) {
+		return;
+	}
+	zoom = Math.max( 0, Math.min( header.zoom_levels - 1, zoom ) );
+	$.each( this.layers, function ( level, layer ) {
+		layer.style.display = level === zoom ? '' : 'none';
+	} );
+	span = header.tile_blocks * Math.pow( 2, header.zoom_levels - 1 - zoom );
+	range = visibleRange( this.svg );
+	minX = Math.max( 0, Math.floor( range.minNeutrons / span ) );
+	maxX = Math.min( Math.floor( header.max_neutron_number / span ),
+		Math.floor( range.maxNeutrons / span ) );
+	minY = Math.max( 0, Math.floor( range.minProtons / span ) );
+	maxY = Math.min( Math.floor( header.max_atomic_number / span ),
+		Math.floor( range.maxProtons / span ) );
+	for ( x = minX; x <= maxX; x++ ) {
+		for ( y = minY; y <= maxY; y++ ) {
+			key = zoom + '/' + x + '/' + y;
+			if ( !this.loaded[ key ] ) {
+				this.loaded[ key ] = true;
+				loadNuclides( this.url + '/' + key, function ( data ) {
+					renderCells( chart.layers[ data.zoom ], data, chart.view );
+				} );
+			}
+		}
+	}
+};
+
 window.addEventListener( 'load', function () {
-	$( '#nuclides' ).panzoom( {
+	var svg = document.getElementById( 'nuclides' ),
+		chart, options, timeout;
+
+	// the page may only be a shell, leaving the chart to be drawn from the API data
+	if ( svg && svg.getAttribute( 'data-src' ) ) {
+		loadNuclides( svg.getAttribute( 'data-src' ), function ( data ) {
+			renderIncomplete( document.getElementById( 'nuclides-incomplete' ), data.incomplete );
+			renderChart( svg, data );
+		} );
+	} else if ( svg && svg.getAttribute( 'data-tiles' ) ) {
+		chart = new TiledChart( svg, svg.getAttribute( 'data-tiles' ) );
+		chart.start();
+	}
+
+	options = {
 		$zoomIn: $( '#nuclides-zoom-in' ),
 		$zoomOut: $( '#nuclides-zoom-out' ),
 		$zoomRange: $( '#nuclides-zoom-range' ),
 		$reset: $( '#nuclides-reset' )
-	} );
+	};
+	if ( chart ) {
+		// the last tiles show single nuclides, worth zooming further into
+		options.maxScale = 8;
+	}
+	$( '#nuclides' ).panzoom( options );
+	if ( chart ) {
+		$( '#nuclides' ).on( 'panzoomchange', function ( e, panzoom, transform ) {
+			// wait for the end of the gesture before loading the tiles
+			clearTimeout( timeout );
+			timeout = setTimeout( function () {
+				chart.update( Number( transform[ 0 ] ) );
+			}, 100 );
+		} );
+	}
 } );
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+import app as ptable
+import chemistry
+import nuclides
+import snapshot
+
+
+def element(number, symbol, period, group=None, special=None, classes=()):
+    return {'number': number, 'symbol': symbol, 'item_id': 'Q%d' % (1000 + number),
+            'label': None, 'period': period, 'group': group, 'special': special,
+            'classes': list(classes)}
+
+
+def nuclide(atomic_number, neutron_number, half_life=None, decay_modes=(), classes=()):
+    return {'atomic_number': atomic_number, 'neutron_number': neutron_number,
+            'item_id': 'Q%d' % (2000000 + atomic_number * 1000 + neutron_number),
+            'label': 'N{0}-{1}'.format(atomic_number, atomic_number + neutron_number),
+            'half_life': half_life, 'decay_modes': list(decay_modes), 'classes': list(classes)}
+
+
+@pytest.fixture
+def snapshot_data():
+    """The data of a small snapshot file, with a few elements and nuclides."""
+    elements = [element(1, 'H', 1, 1), element(2, 'He', 1, 18), element(3, 'Li', 2, 1),
+                element(4, 'Be', 2, 2), element(11, 'Na', 3, 1, classes=['alkali-metal']),
+                element(12, 'Mg', 3, 2), element(120, 'Ubn', None)]
+    return {'elements': elements,
+            'labels': {'en': {item['item_id']: 'element ' + item['symbol'] for item in elements},
+                       'fr': {item['item_id']: 'élément ' + item['symbol'] for item in elements}},
+            'languages': ['en', 'fr', 'de'],
+            'nuclides': [nuclide(1, 0, classes=['stable']), nuclide(1, 1, classes=['stable']),
+                         nuclide(1, 2, 3.9e8, [14646001]), nuclide(2, 1, classes=['stable']),
+                         nuclide(2, 2, classes=['stable']), nuclide(2, 4, 0.8, [14646001]),
+                         nuclide(3, 3, classes=['stable']), nuclide(3, 5, 0.84, [14646001]),
+                         nuclide(4, 3, 4.6e6, [109910])],
+            'magic_numbers': [2, 8]}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, snapshot_data):
+    """A test client of the app, serving the snapshot data without any request to Wikidata."""
+    path = str(tmp_path / 'snapshot.json.gz')
+    snapshot.write_file(path, snapshot_data)
+    monkeypatch.setattr(snapshot.SnapshotFileBase, 'SNAPSHOT_PATH', path)
+    monkeypatch.setattr(ptable, 'element_provider_class', chemistry.SnapshotElementProvider)
+    monkeypatch.setattr(ptable, 'nuclide_provider_class', nuclides.SnapshotNuclideProvider)
+    monkeypatch.setattr(ptable, 'snapshots', snapshot.SnapshotStore())
+    monkeypatch.setattr(ptable, 'label_snapshots', snapshot.SnapshotStore())
+    ptable.static_pages.memo.clear()
+    return ptable.app.test_client()
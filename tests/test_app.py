@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+
+import pytest
+
+import app as ptable
+import base
+import snapshot
+
+
+def symbols(response, prop='elements'):
+    assert response.status_code == 200
+    return [element['symbol'] for element in response.get_json()[prop]]
+
+
+def test_index(client):
+    response = client.get('/?lang=fr')
+    assert response.status_code == 200
+    assert 'élément Na' in response.get_data(as_text=True)
+
+
+def test_language_not_in_snapshot(client, monkeypatch):
+    def get_json(*args, **kwargs):
+        raise OSError('no network')
+
+    monkeypatch.setattr(base, 'get_json', get_json)
+    assert ptable.element_provider_class.get_available_languages() == ['en', 'fr']
+    # the labels in the fallback language are shown instead of fetching them
+    for url, headers in [('/?lang=de', {}), ('/', {'Accept-Language': 'de'})]:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert 'element Na' in response.get_data(as_text=True)
+
+
+def test_vary_language(client):
+    for headers in ({}, {'Accept-Language': 'fr'}):
+        response = client.get('/', headers=headers)
+        assert 'Accept-Language' in response.vary
+        assert response.headers['Cache-Control'].startswith('public')
+    assert 'élément H' in response.get_data(as_text=True)
+    assert 'Accept-Language' in client.get('/api?props=elements').vary
+    assert 'Accept-Language' not in client.get('/?lang=fr').vary
+    assert 'Accept-Language' not in client.get('/api?props=elements&lang=fr').vary
+    for path in ('/nuclides', '/license', '/api', '/api/nuclides'):
+        response = client.get(path, headers={'Accept-Language': 'fr'})
+        assert 'Accept-Language' not in response.vary
+        assert 'Accept-Encoding' in response.vary
+
+
+def test_api(client):
+    result = client.get('/api?props=elements&props=incomplete&props=unknown').get_json()
+    assert sorted(result) == ['elements', 'incomplete']
+    assert [element['symbol'] for element in result['elements']] == [
+        'H', 'He', 'Li', 'Be', 'Na', 'Mg']
+    assert result['elements'][0]['label'] == 'element H'
+    assert [element['symbol'] for element in result['incomplete']] == ['Ubn']
+
+
+def test_api_filters(client):
+    assert symbols(client.get('/api?props=elements&period=2')) == ['Li', 'Be']
+    assert symbols(client.get('/api?props=elements&group=1')) == ['H', 'Li', 'Na']
+    assert symbols(client.get('/api?props=elements&group=1&period=3')) == ['Na']
+    assert symbols(client.get('/api?props=elements&group=1&period=7')) == []
+    assert symbols(client.get('/api?props=incomplete&group=1'), 'incomplete') == []
+    for query in ['group=abc', 'period=', 'special=1.5']:
+        assert client.get('/api?props=elements&' + query).status_code == 400
+
+
+def test_api_fields(client):
+    result = client.get('/api?props=elements&fields=symbol,number&fields=label&period=1')
+    assert result.get_json() == {'elements': [
+        {'label': 'element H', 'number': 1, 'symbol': 'H'},
+        {'label': 'element He', 'number': 2, 'symbol': 'He'}]}
+
+
+def test_api_cached(client):
+    first = client.get('/api?props=elements&lang=fr', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    second = client.get('/api?props=elements&lang=fr', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    other = client.get('/api?props=elements&lang=en', headers={'Accept-Encoding': 'gzip'})
+    assert other.headers['ETag'] != first.headers['ETag']
+
+
+def test_snapshot_file_replaced(client, snapshot_data):
+    assert 'element H' in client.get('/api?props=elements&lang=en').get_data(as_text=True)
+    snapshot_data['labels']['en']['Q1001'] = 'hydrogen'
+    snapshot.write_file(snapshot.SnapshotFileBase.SNAPSHOT_PATH, snapshot_data)
+    # the previous snapshot is served until the new one is built in the background
+    for attempt in range(50):
+        if 'hydrogen' in client.get('/api?props=elements&lang=en').get_data(as_text=True):
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail('the snapshot was not built again from the new file')
+
+
+def test_api_nuclides(client):
+    result = client.get('/api/nuclides').get_json()
+    assert result['count'] == 9
+    assert result['magic_numbers'] == [2, 8]
+    assert result['columns']['atomic_number'] == [1, 1, 1, 2, 2, 2, 3, 3, 4]
+
+
+def test_nuclide_tile(client):
+    response = client.get('/nuclides/tiles/0/0/0')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/octet-stream'
+    assert client.get('/nuclides/tiles/0/1/0').status_code == 404
+    assert client.get('/nuclides/tiles/9/0/0').status_code == 404
+
+
+def test_nuclide_pages(client):
+    for path in ('/nuclides', '/nuclide_decays', '/nuclides?render=tiles'):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert '<svg' in response.get_data(as_text=True)
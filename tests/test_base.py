@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import threading
+import time
+from urllib.error import HTTPError
+
+import pytest
+
+import base
+import cache
+
+
+def test_single_flight_result():
+    flights = base.SingleFlight()
+    assert flights.do('key', lambda: 1) == 1
+    assert flights.do('key', lambda: 2) == 2
+    assert not flights.calls
+
+
+def test_single_flight_shares_error():
+    flights = base.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    errors = []
+
+    def leader():
+        calls.append('leader')
+        started.set()
+        release.wait(5)
+        raise ValueError('upstream failed')
+
+    def follower():
+        calls.append('follower')
+        return 'fetched again'
+
+    def call(func):
+        try:
+            flights.do('key', func)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(leader,))]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call, args=(follower,)) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    # give the followers the time to wait for the leader
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == ['leader']
+    assert len(errors) == 4
+    assert all(error is errors[0] for error in errors)
+    # the error is not remembered, the next call tries again
+    assert flights.do('key', follower) == 'fetched again'
+
+
+class Upstream:
+    """Fails the given number of times, then returns its result."""
+
+    def __init__(self, failures, error=OSError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, timeouts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error('unavailable')
+        return 'result'
+
+
+def test_endpoint_retries():
+    endpoint = base.Endpoint(retries=2, backoff=0)
+    upstream = Upstream(2)
+    assert endpoint.call(upstream) == 'result'
+    assert upstream.calls == 3
+    assert endpoint.failures == 0
+
+
+def test_endpoint_gives_up():
+    endpoint = base.Endpoint(retries=2, backoff=0)
+    upstream = Upstream(3)
+    with pytest.raises(OSError):
+        endpoint.call(upstream)
+    assert upstream.calls == 3
+    assert endpoint.failures == 1
+
+
+def test_endpoint_does_not_retry_bad_requests():
+    endpoint = base.Endpoint(retries=2, backoff=0)
+
+    def upstream(timeouts):
+        upstream.calls += 1
+        raise HTTPError('https://example.org', 400, 'Bad Request', {}, None)
+
+    upstream.calls = 0
+    with pytest.raises(HTTPError):
+        endpoint.call(upstream)
+    assert upstream.calls == 1
+    assert endpoint.failures == 0
+
+
+def test_endpoint_circuit():
+    endpoint = base.Endpoint(retries=0, backoff=0, failure_threshold=2, reset_timeout=60)
+    upstream = Upstream(3)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            endpoint.call(upstream)
+    # open: the endpoint is not called at all
+    with pytest.raises(base.UpstreamUnavailableException):
+        endpoint.call(upstream)
+    assert upstream.calls == 2
+
+    # half-open once the reset timeout elapsed: one call is let through, and fails again
+    endpoint.open_until = time.time() - 1
+    with pytest.raises(OSError):
+        endpoint.call(upstream)
+    assert upstream.calls == 3
+    with pytest.raises(base.UpstreamUnavailableException):
+        endpoint.call(upstream)
+
+    endpoint.open_until = time.time() - 1
+    assert endpoint.call(upstream) == 'result'
+    assert endpoint.failures == 0
+    assert endpoint.call(upstream) == 'result'
+
+
+def test_endpoint_half_open_single_call():
+    endpoint = base.Endpoint(retries=2, backoff=0, failure_threshold=1, reset_timeout=60)
+    with pytest.raises(OSError):
+        endpoint.call(Upstream(3))
+    endpoint.open_until = time.time() - 1
+    others = []
+
+    def probe(timeouts):
+        # the other calls fail meanwhile, instead of piling up on the endpoint
+        try:
+            endpoint.call(Upstream(0))
+        except base.UpstreamUnavailableException as e:
+            others.append(e)
+        raise OSError('still unavailable')
+
+    with pytest.raises(OSError):
+        endpoint.call(probe)
+    assert len(others) == 1
+    # the probe is not retried, and the circuit opens again
+    assert endpoint.open_until > time.time()
+
+
+def test_endpoint_budget():
+    endpoint = base.Endpoint(connect_timeout=5, read_timeout=60, retries=2, backoff=0.5)
+    # three attempts, and the longest backoffs between them
+    assert endpoint.budget == 3 * 65 + 0.75 + 1.5
+
+
+def test_lock_held_for_budget(monkeypatch):
+    timeouts = []
+
+    class Cache(cache.MemoryCache):
+        def locked(self, key, timeout=60):
+            timeouts.append(timeout)
+            return super().locked(key, timeout)
+
+    monkeypatch.setattr(base, 'json_cache', Cache())
+    monkeypatch.setattr(base, 'fetch_json', lambda url, data, get: {'fetched': url})
+    assert base.get_json_cached(base.SparqlBase.SPARQL_API, 'query', True) == \
+        {'fetched': base.SparqlBase.SPARQL_API}
+    assert timeouts == [base.endpoints[base.SparqlBase.SPARQL_API].budget]
+    assert timeouts[0] > 180
+
+
+def test_refresh_reuses_newer(monkeypatch):
+    fetched = []
+
+    def fetch_json(url, data, get):
+        fetched.append(data)
+        return {'fetched': len(fetched)}
+
+    monkeypatch.setattr(base, 'json_cache', cache.MemoryCache())
+    monkeypatch.setattr(base, 'fetch_json', fetch_json)
+    assert base.get_json_cached('https://example.org', 'a', True) == {'fetched': 1}
+    # cached before the data being refreshed was built, so fetched again
+    with base.refreshing(time.time() + 1):
+        assert base.get_json_cached('https://example.org', 'a', True) == {'fetched': 2}
+    # cached since, for instance by the refresh of another process
+    with base.refreshing(time.time() - 1):
+        assert base.get_json_cached('https://example.org', 'a', True) == {'fetched': 2}
+    assert not base.is_refreshing()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import build_snapshot
+import chemistry
+import nuclides
+
+
+def test_patch():
+    records = [{'item_id': 'Q1', 'value': 1}, {'item_id': 'Q2', 'value': 2}]
+    fresh = [{'item_id': 'Q2', 'value': 3}, {'item_id': 'Q1', 'value': 4},
+             {'item_id': 'Q5', 'value': 5}]
+    assert build_snapshot.patch(records, ['Q2', 'Q3'], fresh) == [
+        {'item_id': 'Q1', 'value': 1}, {'item_id': 'Q2', 'value': 3}]
+
+
+class FreshElementProvider(chemistry.ElementProvider):
+    """Returns all its elements, whatever item_ids is set to."""
+
+    elements = []
+    all_ids = []
+
+    @classmethod
+    def get_modified_since(cls, since):
+        return ['Q1001']
+
+    @classmethod
+    def get_all_ids(cls):
+        return cls.all_ids
+
+    def __iter__(self):
+        for values in self.elements:
+            yield chemistry.Element(**{key: value for key, value in values.items()
+                                       if key != 'classes'})
+
+    def get_labels(self, ids):
+        return {item_id: 'fresh' for item_id in ids}
+
+
+class FreshNuclideProvider(nuclides.NuclideProvider):
+
+    all_ids = []
+    magic_numbers = []
+
+    @classmethod
+    def get_modified_since(cls, since):
+        return []
+
+    @classmethod
+    def get_all_ids(cls):
+        return cls.all_ids
+
+    def __iter__(self):
+        return iter(())
+
+    def get_magic_numbers(self):
+        return self.magic_numbers
+
+
+def update(data):
+    return build_snapshot.update(data, 0, element_provider_class=FreshElementProvider,
+                                 nuclide_provider_class=FreshNuclideProvider)
+
+
+def test_update(snapshot_data):
+    boron = dict(snapshot_data['elements'][0], number=5, symbol='B', item_id='Q1005')
+    FreshElementProvider.elements = [dict(element, label='fresh') for element in
+                                     snapshot_data['elements'][:2] + [boron]]
+    # magnesium was deleted, and the first nuclide reclassified
+    FreshElementProvider.all_ids = [element['item_id'] for element in snapshot_data['elements']
+                                    if element['symbol'] != 'Mg']
+    FreshNuclideProvider.all_ids = [item['item_id'] for item in snapshot_data['nuclides'][1:]]
+    FreshNuclideProvider.magic_numbers = [2, 8, 20]
+    removed_nuclide = snapshot_data['nuclides'][0]['item_id']
+    assert update(snapshot_data) == ['Q1001', 'Q1012', removed_nuclide]
+    assert [(item['symbol'], item['label']) for item in snapshot_data['elements']] == [
+        ('He', None), ('Li', None), ('Be', None), ('Na', None), ('Ubn', None), ('H', 'fresh')]
+    assert snapshot_data['labels']['en']['Q1001'] == 'fresh'
+    assert 'Q1012' not in snapshot_data['labels']['en']
+    assert snapshot_data['magic_numbers'] == [2, 8, 20]
+    assert len(snapshot_data['nuclides']) == 8
+
+
+def test_update_keeps_magic_numbers(snapshot_data):
+    FreshElementProvider.elements = snapshot_data['elements'][:1]
+    FreshElementProvider.all_ids = [element['item_id'] for element in snapshot_data['elements']]
+    FreshNuclideProvider.all_ids = [item['item_id'] for item in snapshot_data['nuclides']]
+    # the query failed
+    FreshNuclideProvider.magic_numbers = []
+    assert update(snapshot_data) == ['Q1001']
+    assert snapshot_data['magic_numbers'] == [2, 8]
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+import cache
+
+
+class Clock:
+    """Replaces the time module of the cache module, so time only passes when told."""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path, clock):
+    def make(**kwargs):
+        if request.param == 'memory':
+            return cache.MemoryCache(**kwargs)
+        return cache.SqliteCache(str(tmp_path / 'cache.db'), **kwargs)
+    return make
+
+
+def test_get_set(make_cache):
+    store = make_cache()
+    key = store.make_key('https://example.org', 'a=1', True)
+    assert store.get(key) is None
+    store.set(key, {'value': [1, 2]})
+    assert store.get(key) == {'value': [1, 2]}
+    store.clear()
+    assert store.get(key) is None
+
+
+def test_expired(make_cache, clock):
+    store = make_cache(ttl=60)
+    store.set('key', 'value')
+    clock.sleep(59)
+    assert store.get('key') == 'value'
+    clock.sleep(2)
+    assert store.get('key') is None
+    assert store.get('key', allow_stale=True) == 'value'
+
+
+def test_newer_than(make_cache, clock):
+    store = make_cache(ttl=60)
+    store.set('key', 'value')
+    assert store.get('key', newer_than=clock.now) == 'value'
+    assert store.get('key', newer_than=clock.now + 1) is None
+    clock.sleep(10)
+    assert store.get('key', newer_than=clock.now - 11) == 'value'
+
+
+def test_evicts_least_recently_used(make_cache, clock):
+    store = make_cache(maxsize=2)
+    store.set('a', 1)
+    clock.sleep(100)
+    store.set('b', 2)
+    clock.sleep(100)
+    assert store.get('a') == 1
+    clock.sleep(1)
+    store.set('c', 3)
+    assert store.get('b') is None
+    assert store.get('a') == 1
+    assert store.get('c') == 3
+
+
+def test_sqlite_hits_only_read(tmp_path, clock):
+    store = cache.SqliteCache(str(tmp_path / 'cache.db'), access_interval=60)
+    store.set('key', 'value')
+    conn = store.connect()
+    changes = conn.total_changes
+    clock.sleep(59)
+    assert store.get('key') == 'value'
+    assert conn.total_changes == changes
+    clock.sleep(2)
+    assert store.get('key') == 'value'
+    assert conn.total_changes == changes + 1
+
+
+def test_sqlite_shared(tmp_path, clock):
+    path = str(tmp_path / 'cache.db')
+    cache.SqliteCache(path).set('key', 'value')
+    assert cache.SqliteCache(path).get('key') == 'value'
+
+
+def test_sqlite_locked(tmp_path, clock):
+    first = cache.SqliteCache(str(tmp_path / 'cache.db'), lock_interval=10)
+    second = cache.SqliteCache(str(tmp_path / 'cache.db'), lock_interval=10)
+    with first.locked('key', timeout=30):
+        start = clock.now
+        # another process waits for the lock until it expires
+        with second.locked('key', timeout=30):
+            assert clock.now - start >= 30
+    with second.locked('key', timeout=30):
+        assert clock.now - start < 40
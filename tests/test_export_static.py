@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+
+import app as ptable
+import export_static
+
+
+def test_export(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(ptable.app.jinja_env.globals, 'url_for', export_static.url_for)
+    output = str(tmp_path / 'export')
+    pages = export_static.common_pages + export_static.get_tile_pages()
+    manifest = export_static.export(output, pages, None, {})
+    for language in ('en', 'fr'):
+        manifest.update(export_static.export(output, export_static.language_pages, language, {}))
+    assert os.path.exists(os.path.join(output, 'fr', 'api', 'all.json.gz'))
+    assert os.path.exists(os.path.join(output, 'nuclides', 'tiles', '0', '0', '0'))
+
+    # every link between the pages leads to an exported file
+    for name in manifest:
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(output, name)) as f:
+            links = re.findall(r'(?:href|src)="(/[^/][^"]*)"', f.read())
+        for link in links:
+            if not link.startswith('/static/'):
+                assert link[1:] in manifest, '{0} links to {1}'.format(name, link)
+    with open(os.path.join(output, 'fr', 'index.html')) as f:
+        assert 'élément H' in f.read()
+
+    # only the pages whose inputs changed are exported again
+    os.remove(os.path.join(output, 'license.html'))
+    assert export_static.export(output, pages, None, manifest) == {
+        name: manifest[name] for name, url, inputs in pages}
+    assert os.path.exists(os.path.join(output, 'license.html'))
+
+
+def test_default_languages(client):
+    # the labels in the other languages are not in the snapshot
+    assert export_static.get_default_languages(True) == ['en', 'fr']
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+import base
+import chemistry
+import nuclides
+from nuclides import Nuclide, NuclideProvider, decay_modes, half_life_index, tile_zoom_levels
+
+
+class ListNuclideProvider(NuclideProvider):
+
+    def __init__(self, records):
+        super(ListNuclideProvider, self).__init__()
+        self.records = records
+
+    def __iter__(self):
+        for values in self.records:
+            nuclide = Nuclide(**dict(values, decay_modes=list(values['decay_modes'])))
+            nuclide.classes.extend(values['classes'])
+            yield nuclide
+
+
+def test_get_table(snapshot_data):
+    records = snapshot_data['nuclides'] + [dict(snapshot_data['nuclides'][0], neutron_number=None)]
+    nuclide_list, table, incomplete = ListNuclideProvider(records).get_table()
+    assert len(nuclide_list) == len(table) == 9
+    assert [nuclide.item_id for nuclide in incomplete] == [records[-1]['item_id']]
+    # shared by all the requests, so none of it can be changed
+    assert isinstance(nuclide_list, tuple) and isinstance(incomplete, tuple)
+    assert isinstance(incomplete[0], nuclides.NuclideCell)
+    assert incomplete[0].classes == ('stable',)
+    classes = ListNuclideProvider(records).get_classes(nuclide_list)
+    assert all(isinstance(view_classes, tuple) for view_classes in classes.values())
+    assert table[1, 2].half_life == 3.9e8
+    assert table[1, 2].decay_modes == (14646001,)
+    assert isinstance(table[0, 0], nuclides.NoneCell)
+    assert (table.max_atomic_number, table.max_neutron_number) == (4, 5)
+    assert [cell.neutron_number for cell in table.band(2, 3, 2, 4)] == [2, 4, 3]
+
+
+def test_get_table_duplicates(snapshot_data):
+    records = snapshot_data['nuclides'] + [dict(snapshot_data['nuclides'][2], item_id='Q1')]
+    nuclide_list, table, incomplete = ListNuclideProvider(records).get_table()
+    assert len(nuclide_list) == 9
+    assert all(isinstance(nuclide, nuclides.NuclideCell) for nuclide in nuclide_list)
+    assert table[1, 2].item_id == 'Q1'
+    assert 'Q1' in [nuclide.item_id for nuclide in nuclide_list]
+    assert len(NuclideProvider.get_columns(nuclide_list)['item_id']) == 9
+
+
+def test_freeze():
+    nuclide = Nuclide(atomic_number=1, neutron_number=2, item_id='Q1', decay_modes=[1])
+    nuclide.classes.append('stable')
+    cell = nuclides.NuclideCell.freeze(nuclide)
+    assert dict(cell) == dict(nuclide, decay_modes=(1,))
+    assert cell.classes == ('stable',)
+    with pytest.raises(AttributeError):
+        cell.label = 'changed'
+    assert nuclides.NuclideCell.freeze(cell) is cell
+
+    element = chemistry.Element(number=1, symbol='H', period=1, group=1)
+    cell = chemistry.ElementCell.freeze(element)
+    assert cell.to_dict() == dict(element.to_dict(), classes=())
+    assert chemistry.ElementCell.freeze(cell) is cell
+
+
+def test_element_table(client):
+    elements, table, special_series, incomplete = \
+        chemistry.SnapshotElementProvider().get_table()
+    assert isinstance(elements, tuple) and isinstance(incomplete, tuple)
+    assert [element.symbol for element in incomplete] == ['Ubn']
+    assert isinstance(incomplete[0], chemistry.ElementCell)
+    with pytest.raises(AttributeError):
+        incomplete[0].period = 8
+
+
+def test_get_columns(snapshot_data):
+    nuclide_list = ListNuclideProvider(snapshot_data['nuclides']).get_table()[0]
+    columns = NuclideProvider.get_columns(nuclide_list)
+    assert list(columns['atomic_number']) == [1, 1, 1, 2, 2, 2, 3, 3, 4]
+    assert columns['half_life'][0] == -1
+    assert columns['half_life'][2] == half_life_index(3.9e8)
+    assert columns['decay_mode'][2] == decay_modes.index(14646001)
+    assert list(columns['stable'])[:2] == [1, 1]
+
+    packed = nuclides.pack_columns({'magic_numbers': [2]}, columns)
+    assert int.from_bytes(packed[:4], 'little') % 4 == 0
+
+
+def test_get_tile_nuclides(snapshot_data):
+    table = ListNuclideProvider(snapshot_data['nuclides']).get_table()[1]
+    block, columns = NuclideProvider.get_tile(table, tile_zoom_levels - 1, 0, 0)
+    assert block == 1
+    assert list(columns['item_id']) == [int(record['item_id'][1:])
+                                        for record in snapshot_data['nuclides']]
+
+
+def test_get_tile_blocks(snapshot_data):
+    records = snapshot_data['nuclides'] + [
+        dict(snapshot_data['nuclides'][-1], item_id='Q1', neutron_number=2, half_life=None,
+             decay_modes=[109910])]
+    table = ListNuclideProvider(records).get_table()[1]
+    block, columns = NuclideProvider.get_tile(table, tile_zoom_levels - 2, 0, 0)
+    assert block == 2
+    blocks = list(zip(columns['atomic_number'], columns['neutron_number']))
+    assert blocks == [(0, 0), (0, 2), (2, 0), (2, 2), (2, 4), (4, 2)]
+    assert set(columns['item_id']) == {0}
+    position = blocks.index((0, 0))
+    assert (columns['half_life'][position], columns['stable'][position]) == (-1, 1)
+    position = blocks.index((2, 4))
+    assert columns['half_life'][position] == half_life_index(0.8)
+    assert columns['stable'][position] == 0
+    # only one of the nuclides of the block has a known half-life
+    position = blocks.index((4, 2))
+    assert columns['half_life'][position] == half_life_index(4.6e6)
+    assert columns['decay_mode'][position] == decay_modes.index(109910)
+    assert columns['stable'][position] == 0
+
+    # tiles beyond the chart are empty
+    block, columns = NuclideProvider.get_tile(table, tile_zoom_levels - 1, 1, 1)
+    assert len(columns['item_id']) == 0
+
+
+def test_dominant():
+    assert nuclides.dominant([3, 1, 3, -1, -1, -1]) == 3
+    assert nuclides.dominant([2, 1]) == 1
+    assert nuclides.dominant([-1]) == -1
+
+
+class StreamedResponse:
+    """Lines of a CSV response, failing after them unless complete."""
+
+    will_close = True
+
+    def __init__(self, lines, complete=True):
+        self.lines = lines
+        self.complete = complete
+
+    def __iter__(self):
+        for line in self.lines:
+            yield line.encode('utf-8') + b'\n'
+        if not self.complete:
+            raise OSError('connection reset')
+
+    def read(self):
+        return b''
+
+
+class Connection:
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def stream_nuclides(monkeypatch, nuclide_result, half_lives):
+    """Make the nuclide queries return these results, streamed, and return the connections."""
+    connections = []
+
+    def open_sparql(query):
+        if '?half_life' not in query:
+            return nuclide_result if '?decay_mode' not in query else []
+        connections.append(Connection())
+        return base.StreamedResult('http://localhost/sparql', connections[-1], half_lives)
+
+    monkeypatch.setattr(nuclides.SparqlNuclideProvider, 'STREAM_RESULTS', True)
+    monkeypatch.setattr(nuclides.SparqlNuclideProvider, 'try_open_sparql',
+                        staticmethod(open_sparql))
+    monkeypatch.setattr(nuclides.SparqlNuclideProvider, 'try_get_sparql',
+                        staticmethod(lambda query: []))
+    return connections
+
+
+nuclide_result = [{'nuclide': {'value': 'http://www.wikidata.org/entity/Q' + item_id},
+                   'atomic_number': {'value': '1'}, 'neutron_number': {'value': neutrons},
+                   'label': {'value': 'hydrogen'}, 'stable': {'value': 'false'}}
+                  for item_id, neutrons in [('1', '1'), ('2', '2')]]
+
+
+def test_stream_failing_optional(monkeypatch):
+    half_lives = StreamedResponse(['nuclide,half_life,unit_factor',
+                                   'http://www.wikidata.org/entity/Q1,2,3'], complete=False)
+    connections = stream_nuclides(monkeypatch, nuclide_result, half_lives)
+    # the half-lives read before the failure are kept
+    assert [(nuclide.item_id, nuclide.half_life)
+            for nuclide in nuclides.SparqlNuclideProvider()] == [('Q1', 6.0), ('Q2', None)]
+    assert connections[0].closed
+
+
+def test_refresh_failing_optional(monkeypatch):
+    # the complete snapshot is kept instead, until the next refresh
+    half_lives = StreamedResponse(['nuclide,half_life,unit_factor',
+                                   'http://www.wikidata.org/entity/Q1,2,3'], complete=False)
+    connections = stream_nuclides(monkeypatch, nuclide_result, half_lives)
+    with base.refreshing(), pytest.raises(OSError):
+        list(nuclides.SparqlNuclideProvider())
+    assert connections[0].closed
+    monkeypatch.setattr(nuclides.SparqlNuclideProvider, 'try_get_sparql',
+                        staticmethod(lambda query: OSError('unavailable')))
+    with base.refreshing(), pytest.raises(OSError):
+        nuclides.SparqlNuclideProvider().get_magic_numbers()
+
+
+def test_stream_failing_closes_pending(monkeypatch):
+    half_lives = StreamedResponse(['nuclide,half_life,unit_factor'])
+    connections = stream_nuclides(monkeypatch, OSError('unavailable'), half_lives)
+    with pytest.raises(OSError):
+        list(nuclides.SparqlNuclideProvider())
+    assert connections[0].closed
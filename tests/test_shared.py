@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+
+import pytest
+
+import chemistry
+import nuclides
+import shared
+import snapshot
+
+
+def test_round_trip(tmp_path, snapshot_data):
+    path = str(tmp_path / 'snapshot.shm')
+    shared.write(path, snapshot_data)
+    data = shared.SharedSnapshot(path).data
+    assert list(data['elements']) == snapshot_data['elements']
+    assert list(data['nuclides']) == snapshot_data['nuclides']
+    assert data['elements'][-1] == snapshot_data['elements'][-1]
+    for language, labels in snapshot_data['labels'].items():
+        assert dict(data['labels'][language]) == labels
+    assert 'Q1' not in data['labels']['en']
+    assert data['languages'] == snapshot_data['languages']
+    assert data['magic_numbers'] == snapshot_data['magic_numbers']
+
+
+def test_invalid(tmp_path):
+    path = str(tmp_path / 'snapshot.shm')
+    with open(path, 'wb') as f:
+        f.write(b'not a shared snapshot')
+    with pytest.raises(snapshot.InvalidSnapshotFileException):
+        shared.SharedSnapshot(path)
+
+
+def test_load_replaced(tmp_path, snapshot_data):
+    path = str(tmp_path / 'snapshot.shm')
+    shared.write(path, snapshot_data)
+    first = shared.load(path)
+    assert shared.load(path) is first
+    snapshot_data['magic_numbers'] = [2, 8, 20]
+    shared.write(path, snapshot_data)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert shared.load(path)['magic_numbers'] == [2, 8, 20]
+
+
+def test_providers(tmp_path, monkeypatch, snapshot_data):
+    # shown in the chart instead of the first nuclide with the same numbers
+    duplicate = dict(snapshot_data['nuclides'][0], item_id='Q1', label='duplicate')
+    snapshot_data['nuclides'].append(duplicate)
+    monkeypatch.setattr(snapshot.SnapshotFileBase, 'SNAPSHOT_PATH',
+                        str(tmp_path / 'snapshot.json.gz'))
+    monkeypatch.setattr(shared.SharedFileBase, 'SNAPSHOT_PATH', str(tmp_path / 'snapshot.shm'))
+    snapshot.write_file(snapshot.SnapshotFileBase.SNAPSHOT_PATH, snapshot_data)
+    shared.write(shared.SharedFileBase.SNAPSHOT_PATH, snapshot_data)
+
+    elements = chemistry.SharedElementProvider().get_table()
+    expected = chemistry.SnapshotElementProvider().get_table()
+    assert all(isinstance(element, chemistry.ElementView) for element in elements[0])
+    assert [element.to_dict() for element in elements[0]] == \
+        [element.to_dict() for element in expected[0]]
+
+    provider = nuclides.SharedNuclideProvider()
+    nuclide_list, table, incomplete = provider.get_table()
+    expected_list, expected_table, expected_incomplete = \
+        nuclides.SnapshotNuclideProvider().get_table()
+    assert all(isinstance(nuclide, nuclides.NuclideView) for nuclide in nuclide_list)
+    assert list(map(tuple, nuclide_list)) == list(map(tuple, expected_list))
+    assert table[1, 0].label == 'duplicate'
+    assert (1, 0) in table and (0, 1) not in table and table[0, 1] is table.empty
+    assert len(table) == len(expected_table)
+    assert (table.max_atomic_number, table.max_neutron_number) == \
+        (expected_table.max_atomic_number, expected_table.max_neutron_number)
+    assert [tuple(cell) for cell in table.band(1, 2, 1, 2)] == \
+        [tuple(cell) for cell in expected_table.band(1, 2, 1, 2)]
+    assert provider.get_columns(nuclide_list) == provider.get_columns(expected_list)
+    assert provider.get_tile(table, 2, 0, 0) == provider.get_tile(expected_table, 2, 0, 0)
+    assert provider.get_classes(nuclide_list) == provider.get_classes(expected_list)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright © 2026 The Wikidata periodic table contributors
+
+This file is part of the Wikidata periodic table.
+
+The Wikidata periodic table is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The Wikidata periodic table is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the Wikidata periodic table.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import snapshot
+
+
+def test_store_drops_least_recently_read():
+    store = snapshot.SnapshotStore(maxsize=2)
+    for language in ['en', 'fr', 'de', 'en']:
+        store.get(('labels', language), lambda: snapshot.Snapshot(language))
+    assert set(store.snapshots) == {('labels', 'de'), ('labels', 'en')}
+    # nothing is left behind for the dropped ones
+    assert set(store.build_locks) <= set(store.snapshots)
+    assert set(store.last_read) <= set(store.snapshots)